@@ -61,6 +61,9 @@ a = Analysis(
         # Advanced deduplication
         'imagehash',  # Perceptual hashing library
         'difflib',    # Text similarity (built-in Python)
+        'rapidfuzz',  # Fast text similarity (optional)
+        'rapidfuzz.fuzz',
+        'rapidfuzz.process',
         # EasyOCR (optional - CPU-only mode)
         'easyocr',
         # PyTorch for EasyOCR (CPU version)
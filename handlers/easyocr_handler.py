@@ -24,6 +24,13 @@ try:
 except ImportError:
     pass
 
+IMAGEHASH_AVAILABLE = False
+try:
+    import imagehash
+    IMAGEHASH_AVAILABLE = True
+except ImportError:
+    pass
+
 
 class EasyOCRHandler:
     """Handler cho EasyOCR - CPU-only mode"""
@@ -285,26 +292,25 @@ class EasyOCRHandler:
         
         # SMART HASH: Chỉ hash vùng TEXT (1/3 dưới ảnh - nơi subtitle thường xuất hiện)
         # Cutscene thay đổi background nhưng subtitle ở vùng cố định
-        try:
-            import imagehash
-            w, h = img_pil.size
-            # Crop 1/3 dưới (vùng subtitle) - hoặc 40% nếu ảnh nhỏ
-            crop_ratio = 0.35
-            text_region = img_pil.crop((0, int(h * (1 - crop_ratio)), w, h))
-            
-            # Hash vùng text với size nhỏ hơn (nhanh hơn + nhạy hơn với text change)
-            text_hash = str(imagehash.average_hash(text_region, hash_size=12))
-            
-            if text_hash == self.last_result_hash:
-                # Vùng text giống hệt → skip OCR
-                return self.last_result_text
-            
-            # Text region changed → update hash và chạy OCR
-            self.last_result_hash = text_hash
-        except ImportError:
-            pass  # Không có imagehash → luôn chạy OCR
-        except Exception:
-            pass  # Lỗi → luôn chạy OCR để safe
+        # Không có imagehash → luôn chạy OCR
+        if IMAGEHASH_AVAILABLE:
+            try:
+                w, h = img_pil.size
+                # Crop 1/3 dưới (vùng subtitle) - hoặc 40% nếu ảnh nhỏ
+                crop_ratio = 0.35
+                text_region = img_pil.crop((0, int(h * (1 - crop_ratio)), w, h))
+                
+                # Hash vùng text với size nhỏ hơn (nhanh hơn + nhạy hơn với text change)
+                text_hash = str(imagehash.average_hash(text_region, hash_size=12))
+                
+                if text_hash == self.last_result_hash:
+                    # Vùng text giống hệt → skip OCR
+                    return self.last_result_text
+                
+                # Text region changed → update hash và chạy OCR
+                self.last_result_hash = text_hash
+            except Exception:
+                pass  # Lỗi → luôn chạy OCR để safe
         
         # Update call time
         self.last_call_time = now
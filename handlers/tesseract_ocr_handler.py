@@ -7,6 +7,7 @@ import numpy as np
 import pytesseract
 import sys
 import os
+import threading
 
 try:
     from modules import log_error, log_debug
@@ -20,6 +21,15 @@ except ImportError:
         pass
     ADVANCED_PROCESSING_AVAILABLE = False
 
+# Tesseract config theo mode - build 1 lần ở module level
+_TESS_CFG = {
+    'subtitle': '--psm 7 --oem 3 -c preserve_interword_spaces=1',
+    # Gaming: PSM 6 cho dialogue boxes
+    'gaming': '--psm 6 --oem 3 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789.,!?\'":;()[]{}*~-_/<>\\$%&@+= ',
+    'document': '--psm 3 --oem 3',
+}
+_DEFAULT_CFG = '--psm 6 --oem 3'
+
 
 class TesseractOCRHandler:
     """Handler cho Tesseract OCR với các kỹ thuật tối ưu"""
@@ -41,6 +51,16 @@ class TesseractOCRHandler:
         self.enable_multi_scale = enable_multi_scale
         self.enable_game_mode = enable_game_mode
         self.game_mode_fast = game_mode_fast
+        # CLAHE object dùng lại giữa các frame (tránh tạo lại mỗi lần gọi)
+        # cv2.CLAHE không thread-safe → mỗi thread gọi recognize/detect_text_regions 1 instance riêng
+        self._clahe_local = threading.local()
+        # Lookup table complexity (0-100) -> adjusted threshold cho các base threshold hay dùng
+        # Giá trị tính đúng tại mỗi complexity nguyên c - cũng đúng cho cả bucket (c, c+1)
+        # trừ bucket (70, 71) (xem _adjust_confidence_threshold)
+        self._conf_lut = {
+            base: tuple(self._compute_confidence_threshold(base, c) for c in range(101))
+            for base in (40, 50)
+        }
         
         # Advanced image processor cho game graphics (chỉ khi không dùng fast mode)
         if ADVANCED_PROCESSING_AVAILABLE and self.enable_game_mode and not self.game_mode_fast:
@@ -66,15 +86,7 @@ class TesseractOCRHandler:
         - PSM 6: Assume a single uniform block of text (default, tốt cho dialogues)
         - PSM 7: Treat the image as a single text line (tốt cho subtitle 1 dòng)
         """
-        if mode == 'subtitle':
-            return '--psm 7 --oem 3 -c preserve_interword_spaces=1'
-        elif mode == 'gaming':
-            # Gaming: PSM 6 cho dialogue boxes
-            return '--psm 6 --oem 3 -c tessedit_char_whitelist=ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz0123456789.,!?\'":;()[]{}*~-_/<>\\$%&@+= '
-        elif mode == 'document':
-            return '--psm 3 --oem 3'
-        else:
-            return '--psm 6 --oem 3'
+        return _TESS_CFG.get(mode, _DEFAULT_CFG)
     
     def _detect_blur(self, img):
         """Detect blur level using Laplacian variance. Higher = sharper"""
@@ -83,15 +95,41 @@ class TesseractOCRHandler:
     
     def _measure_contrast(self, img):
         """Measure contrast level (0-100)"""
-        return img.std()
+        # meanStdDev tính sum + sumsq trong 1 pass, không tạo float64 temp như img.std()
+        _, stddev = cv2.meanStdDev(img)
+        return float(stddev[0][0])
+    
+    def _get_clahe(self):
+        """CLAHE instance của thread hiện tại (tạo lần đầu thread đó cần)"""
+        clahe = getattr(self._clahe_local, 'clahe', None)
+        if clahe is None:
+            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+            self._clahe_local.clahe = clahe
+        return clahe
+    
+    def _to_gray(self, img):
+        """
+        BGR -> grayscale
+        Ảnh đã grayscale trả về nguyên bản (không copy) - các bước sau
+        đều ghi ra array mới, không sửa in-place
+        """
+        if len(img.shape) != 3:
+            return img
+        return cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
     
     def _select_preprocessing_strategy(self, img):
         """
         Intelligent preprocessing selection - chỉ xử lý khi cần thiết
         Returns: strategy name
         """
-        blur_score = self._detect_blur(img)
-        contrast = self._measure_contrast(img)
+        # Chỉ phân tích center crop 256x256 - blur/contrast là thống kê
+        # không phụ thuộc kích thước nên threshold vẫn giữ nguyên
+        h, w = img.shape[:2]
+        cy, cx = h // 2, w // 2
+        sample = img[max(0, cy - 128):cy + 128, max(0, cx - 128):cx + 128]
+
+        blur_score = self._detect_blur(sample)
+        contrast = self._measure_contrast(sample)
         
         # High quality image - minimal processing (FAST PATH)
         if blur_score > 100 and contrast > 40:
@@ -120,17 +158,20 @@ class TesseractOCRHandler:
         
         # GAME MODE FAST: Chỉ CLAHE + threshold, rất nhanh (~10-30ms)
         if self.enable_game_mode and self.game_mode_fast:
-            if len(img.shape) == 3:
-                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-            else:
-                gray = img.copy()
+            gray = self._to_gray(img)
             
             # CLAHE nhẹ để tăng contrast
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-            enhanced = clahe.apply(gray)
+            enhanced = self._get_clahe().apply(gray)
             
             # Otsu threshold - nhanh và hiệu quả
-            _, processed = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+            # Ảnh lớn: tính ngưỡng Otsu trên subsample 1/16 (histogram gần như giống hệt)
+            # rồi áp binary threshold thường lên ảnh đầy đủ
+            if min(enhanced.shape[:2]) >= 64:
+                sub = np.ascontiguousarray(enhanced[::4, ::4])
+                thr, _ = cv2.threshold(sub, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+                _, processed = cv2.threshold(enhanced, thr, 255, cv2.THRESH_BINARY_INV)
+            else:
+                _, processed = cv2.threshold(enhanced, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
             return processed
         
         # GAME MODE FULL: Advanced preprocessing pipeline (chậm hơn nhưng ổn định hơn)
@@ -157,10 +198,7 @@ class TesseractOCRHandler:
                 # Fallback về standard preprocessing
         
         # STANDARD MODE: Legacy preprocessing
-        if len(img.shape) == 3:
-            gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        else:
-            gray = img.copy()
+        gray = self._to_gray(img)
         
         try:
             h, w = gray.shape[:2]
@@ -187,14 +225,12 @@ class TesseractOCRHandler:
                 gray = self._adaptive_sharpen(gray)
             elif strategy == 'contrast':
                 # Chỉ CLAHE khi low contrast
-                clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-                gray = clahe.apply(gray)
+                gray = self._get_clahe().apply(gray)
             else:
                 # Standard: light denoising + CLAHE
                 if max(h, w) > 300:
                     gray = cv2.fastNlMeansDenoising(gray, h=5, templateWindowSize=5, searchWindowSize=15)
-                clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-                gray = clahe.apply(gray)
+                gray = self._get_clahe().apply(gray)
             
             
             # Thresholding
@@ -234,8 +270,18 @@ class TesseractOCRHandler:
         """Check if morphology is needed - detect fragmented text"""
         # Count small contours - nhiều contour nhỏ = fragmented
         contours, _ = cv2.findContours(binary_img, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        small_contours = sum(1 for c in contours if cv2.contourArea(c) < 50)
-        return small_contours > 10
+        if len(contours) <= 10:
+            return False
+        # Bounding rect area >= contour area nên bbox < 50 ⇒ contour < 50
+        # Dừng sớm khi đã đủ 11 contour nhỏ
+        small_contours = 0
+        for c in contours:
+            _, _, cw, ch = cv2.boundingRect(c)
+            if cw * ch < 50:
+                small_contours += 1
+                if small_contours > 10:
+                    return True
+        return False
     
     def _adaptive_sharpen(self, img):
         """
@@ -301,7 +347,9 @@ class TesseractOCRHandler:
                 final_scale = scale_factor
             
             if abs(final_scale - 1.0) > 0.01:  # Only resize if scale is significantly different
-                scaled = cv2.resize(img, None, fx=final_scale, fy=final_scale, interpolation=cv2.INTER_CUBIC)
+                # Upscale nhẹ (<=1.5x): INTER_LINEAR đủ tốt vì Tesseract tự binarize lại
+                interp = cv2.INTER_LINEAR if final_scale <= 1.5 else cv2.INTER_CUBIC
+                scaled = cv2.resize(img, None, fx=final_scale, fy=final_scale, interpolation=interp)
                 return scaled
             return img
         except Exception as e:
@@ -327,34 +375,52 @@ class TesseractOCRHandler:
                 return []
         
         try:
-            if len(img.shape) == 3:
-                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
+            gray = self._to_gray(img)
+            
+            # Input đã được binarize (output của preprocess_for_ocr) -> bỏ qua
+            # bilateral + CLAHE + Otsu, dùng trực tiếp làm binary mask
+            already_binary = self._is_binary(gray)
+            
+            # Bước 0: Downsample 2x cho ảnh lớn - chỉ cần bounding boxes,
+            # không mất thông tin ở mức region mà giảm 4x số pixel
+            orig_h, orig_w = gray.shape[:2]
+            scale = 0.5 if min(orig_h, orig_w) > 600 else 1.0
+            if scale != 1.0:
+                # INTER_NEAREST giữ ảnh binary ở dạng {0, 255}
+                interp = cv2.INTER_NEAREST if already_binary else cv2.INTER_AREA
+                gray = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=interp)
+            min_side = 10 * scale
+            scaled_min_area = min_area * scale * scale
+            
+            if already_binary:
+                # Otsu BINARY_INV trên ảnh {0, 255} chính là đảo bit: text (đen trên nền trắng
+                # từ preprocess_for_ocr) thành trắng để dilate/findContours bắt đúng text
+                binary = cv2.bitwise_not(gray)
             else:
-                gray = img.copy()
-            
-            # Bước 1: Denoising trước khi threshold
-            # BILATERAL FILTER: Faster (5-10ms) và preserve edges tốt hơn cho game graphics
-            gray = cv2.bilateralFilter(gray, d=5, sigmaColor=50, sigmaSpace=50)
-            
-            # Bước 2: CLAHE để tăng contrast
-            clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-            gray = clahe.apply(gray)
-            
-            # Bước 3: Otsu's threshold để tách text tốt hơn
-            _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
+                # Bước 1: Denoising trước khi threshold
+                # BILATERAL FILTER: Faster (5-10ms) và preserve edges tốt hơn cho game graphics
+                gray = cv2.bilateralFilter(gray, d=5, sigmaColor=50, sigmaSpace=50)
+                
+                # Bước 2: CLAHE để tăng contrast
+                gray = self._get_clahe().apply(gray)
+                
+                # Bước 3: Otsu's threshold để tách text tốt hơn
+                _, binary = cv2.threshold(gray, 0, 255, cv2.THRESH_BINARY_INV + cv2.THRESH_OTSU)
             
             # Bước 4: Morphological operations để kết nối text
-            # Adaptive kernel dựa trên image size
-            h, w = gray.shape
-            kernel_size = 3 if max(h, w) > 500 else 2
+            # Adaptive kernel dựa trên kích thước ảnh GỐC; ảnh đã downsample thì giảm
+            # iterations theo scale để khoảng nối text (tính theo pixel gốc) không đổi
+            kernel_size = 3 if max(orig_h, orig_w) > 500 else 2
             kernel = cv2.getStructuringElement(cv2.MORPH_RECT, (kernel_size, kernel_size))
-            dilated = cv2.dilate(binary, kernel, iterations=2)
+            dilated = cv2.dilate(binary, kernel, iterations=max(1, int(round(2 * scale))))
+            h, w = gray.shape
             
             # Bước 5: Find contours với RETR_EXTERNAL
             contours, _ = cv2.findContours(dilated, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
             
             # Bước 6: Filter và collect regions với criteria nâng cao
-            regions = []
+            # Pass 1: filter rẻ (size, aspect ratio, area) - chỉ dùng boundingRect
+            candidates = []
             img_area = h * w
             
             for contour in contours:
@@ -363,7 +429,7 @@ class TesseractOCRHandler:
                 
                 # Filter criteria nâng cao
                 # 1. Minimum size
-                if area < min_area or w < 10 or h < 10:
+                if area < scaled_min_area or w < min_side or h < min_side:
                     continue
                 
                 # 2. Aspect ratio check (text thường không quá vuông hoặc quá dài)
@@ -375,16 +441,30 @@ class TesseractOCRHandler:
                 if area > img_area * 0.8:
                     continue
                 
+                candidates.append((x, y, w, h, contour))
+            
+            # Pass 2: Solidity check (convex hull - đắt nhất) chỉ trên các candidate còn lại
+            # Region nhỏ bỏ qua hull vì hiếm khi bị loại
+            min_hull_area = 200 * scale * scale
+            regions = []
+            padding = 5
+            
+            for x, y, w, h, contour in candidates:
                 # 4. Solidity check (text region không quá thưa thớt)
-                hull = cv2.convexHull(contour)
-                hull_area = cv2.contourArea(hull)
-                if hull_area > 0:
-                    solidity = area / hull_area
-                    if solidity < 0.3:  # Quá thưa thớt, không phải text
-                        continue
+                area = w * h
+                if area >= min_hull_area:
+                    hull = cv2.convexHull(contour)
+                    hull_area = cv2.contourArea(hull)
+                    if hull_area > 0:
+                        solidity = area / hull_area
+                        if solidity < 0.3:  # Quá thưa thớt, không phải text
+                            continue
+                
+                # Upscale về tọa độ ảnh gốc
+                if scale != 1.0:
+                    x, y, w, h = int(x / scale), int(y / scale), int(w / scale), int(h / scale)
                 
                 # Expand region slightly để capture full text
-                padding = 5
                 x = max(0, x - padding)
                 y = max(0, y - padding)
                 w = min(img.shape[1] - x, w + padding * 2)
@@ -403,6 +483,14 @@ class TesseractOCRHandler:
             log_error(f"Text region detection error: {e}", e)
             return []
     
+    def _is_binary(self, gray):
+        """
+        Kiểm tra ảnh đã binary ({0, 255}) chưa
+        Quét toàn ảnh (inRange + countNonZero, 1 pass C-level) - sample thưa có thể
+        nhầm frame màu có letterbox/UI tối là binary và bỏ qua denoise/CLAHE
+        """
+        return cv2.countNonZero(cv2.inRange(gray, 1, 254)) == 0
+    
     def _merge_text_regions(self, regions, img_shape):
         """
         Merge các text regions gần nhau hoặc overlap
@@ -449,16 +537,17 @@ class TesseractOCRHandler:
         
         return merged
     
-    def ocr_region_with_confidence(self, img, region, confidence_threshold=50, scale_factor=1.0):
+    def ocr_region_with_confidence(self, img, region, confidence_threshold=50, scale_factor=1.0, roi=None):
         """
         OCR region với adaptive confidence filtering và multi-scale support
         Confidence threshold được điều chỉnh dựa trên background complexity
+        
+        Args:
+            roi: ROI đã cắt sẵn (contiguous) - multi-scale truyền vào để chỉ cắt 1 lần/region
         """
         try:
-            x, y, w, h = region
-            if len(img.shape) == 3:
-                roi = img[y:y+h, x:x+w]
-            else:
+            if roi is None:
+                x, y, w, h = region
                 roi = img[y:y+h, x:x+w]
             
             # Validate ROI
@@ -511,6 +600,18 @@ class TesseractOCRHandler:
         Background phức tạp -> threshold thấp hơn (chấp nhận text có confidence thấp hơn)
         Background đơn giản -> threshold cao hơn (chỉ lấy text có confidence cao)
         """
+        lut = self._conf_lut.get(base_threshold)
+        if lut is not None and 0 <= complexity <= 100:
+            idx = int(complexity)
+            # Mốc > 70 là so sánh chặt: complexity = 70 giữ nguyên threshold nhưng 70.x thì giảm
+            # → chỉ bucket này phải tính lại, mọi bucket khác cùng nhánh với giá trị nguyên
+            if idx != 70 or complexity == 70:
+                return lut[idx]
+        return self._compute_confidence_threshold(base_threshold, complexity)
+    
+    @staticmethod
+    def _compute_confidence_threshold(base_threshold, complexity):
+        """Piecewise complexity -> threshold (dùng để build lookup table và fallback)"""
         if complexity < 30:
             # Background đơn giản - tăng threshold 10%
             return min(90, base_threshold + 10)
@@ -546,17 +647,24 @@ class TesseractOCRHandler:
                 
                 if regions:
                     all_texts = []
+                    # Scales chỉ phụ thuộc ảnh đã preprocess (giống nhau cho mọi region)
+                    # → Laplacian variance chạy 1 lần/frame thay vì 1 lần/region
+                    if self.enable_multi_scale:
+                        optimal_scales = self._select_optimal_scales(processed_cv_img)
                     
                     for region in regions:
                         if self.enable_multi_scale:
-                            optimal_scales = self._select_optimal_scales(processed_cv_img)
                             best_result = None
                             best_score = 0.0
                             
+                            # Cắt ROI contiguous 1 lần cho tất cả scales
+                            rx, ry, rw, rh = region
+                            roi = np.ascontiguousarray(processed_cv_img[ry:ry+rh, rx:rx+rw])
+                            
                             for scale in optimal_scales:
                                 try:
                                     text, avg_conf, word_count = self.ocr_region_with_confidence(
-                                        processed_cv_img, region, confidence_threshold, scale_factor=scale
+                                        processed_cv_img, region, confidence_threshold, scale_factor=scale, roi=roi
                                     )
                                     
                                     if text:
@@ -593,10 +701,13 @@ class TesseractOCRHandler:
                 best_result = None
                 best_score = 0.0
                 
+                # Full image: đảm bảo contiguous 1 lần (không copy nếu đã contiguous)
+                roi = np.ascontiguousarray(processed_cv_img)
+                
                 for scale in optimal_scales:
                     try:
                         text, avg_conf, word_count = self.ocr_region_with_confidence(
-                            processed_cv_img, full_img_region, confidence_threshold, scale_factor=scale
+                            processed_cv_img, full_img_region, confidence_threshold, scale_factor=scale, roi=roi
                         )
                         
                         if text:
@@ -618,10 +729,8 @@ class TesseractOCRHandler:
                 
                 # Basic text normalization trước khi return
                 if text:
-                    import re
                     # Collapse multiple spaces
-                    text = re.sub(r'\s+', ' ', text)
-                    text = text.strip()
+                    text = ' '.join(text.split())
                 
                 return text if text else ""
         except Exception as e:
@@ -15,7 +15,8 @@ from .batch_translation import (
     split_into_sentences,
     translate_batch_google,
     translate_batch_deepl,
-    should_use_batch_translation
+    should_use_batch_translation,
+    clear_sentence_cache
 )
 from .deepl_context import DeepLContextManager
 from .text_validator import (
@@ -46,6 +47,7 @@ __all__ = [
     'translate_batch_google',
     'translate_batch_deepl',
     'should_use_batch_translation',
+    'clear_sentence_cache',
     'DeepLContextManager',
     'is_valid_dialogue_text',
     'should_translate_text',
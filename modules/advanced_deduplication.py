@@ -1,11 +1,11 @@
 """Advanced Deduplication - Lọc text trùng lặp nâng cao"""
 import re
 import time
+import threading
+import unicodedata
 import difflib
 import numpy as np
-from PIL import Image
 import cv2
-from collections import deque
 from typing import Optional, Tuple
 
 try:
@@ -16,16 +16,87 @@ except ImportError:
     def log_debug(msg):
         pass
 
+# Hash lỗi - chỉ match với chính nó (vừa uint64)
+_ERROR_HASH = 0xFFFFFFFFFFFFFFFF
+
+# Numba (optional) - JIT popcount kernel khi NumPy < 2.0
 try:
-    import imagehash
-    IMAGEHASH_AVAILABLE = True
+    from numba import njit
+    NUMBA_AVAILABLE = True
 except ImportError:
-    pass
+    NUMBA_AVAILABLE = False
+
+_M1 = np.uint64(0x5555555555555555)
+_M2 = np.uint64(0x3333333333333333)
+_M4 = np.uint64(0x0F0F0F0F0F0F0F0F)
+_H01 = np.uint64(0x0101010101010101)
+
+
+def _popcount_u64_swar(x):
+    """SWAR popcount (constants phải là np.uint64 để không bị promote sang float)"""
+    x = x - ((x >> np.uint64(1)) & _M1)
+    x = (x & _M2) + ((x >> np.uint64(2)) & _M2)
+    x = (x + (x >> np.uint64(4))) & _M4
+    return (x * _H01) >> np.uint64(56)
+
+
+# Vectorized popcount trên mảng uint64 - np.bitwise_count có từ NumPy 2.0
+if hasattr(np, 'bitwise_count'):
+    _popcount_u64 = np.bitwise_count
+elif NUMBA_AVAILABLE:
+    try:
+        @njit(cache=True, nogil=True)
+        def _popcount_u64(x):
+            """SWAR popcount 1 pass, không tạo array tạm cho từng bước"""
+            out = np.empty(x.shape[0], dtype=np.uint64)
+            for i in range(x.shape[0]):
+                v = x[i]
+                v = v - ((v >> np.uint64(1)) & _M1)
+                v = (v & _M2) + ((v >> np.uint64(2)) & _M2)
+                v = (v + (v >> np.uint64(4))) & _M4
+                out[i] = (v * _H01) >> np.uint64(56)
+            return out
+    except Exception:
+        # cache=True có thể lỗi khi không ghi được cache dir (vd. bản build exe)
+        _popcount_u64 = _popcount_u64_swar
+else:
+    _popcount_u64 = _popcount_u64_swar
+
+# RapidFuzz (C++) - nhanh hơn difflib nhiều lần, fallback về difflib nếu không có
+try:
+    from rapidfuzz.fuzz import ratio as _rf_ratio
+    from rapidfuzz.process import cdist as _rf_cdist
+    RAPIDFUZZ_AVAILABLE = True
+except ImportError:
+    RAPIDFUZZ_AVAILABLE = False
+
+# Bind sẵn các hàm gọi mỗi frame - tránh attribute lookup trên module
+_SequenceMatcher = difflib.SequenceMatcher
+_unicode_normalize = unicodedata.normalize
 
 
 class AdvancedDeduplicator:
     """Deduplication với hybrid approach"""
     
+    # Regex normalize - compile 1 lần ở class level
+    _RE_EMOTION = re.compile(r'\[[^\]\n]{1,200}\]|\([^)\n]{1,200}\)|\*{1,4}[^*\n]{1,200}\*{1,4}')
+    # Chuỗi lặp của cùng 1 dấu câu (!!! ??? ~~~ ... --) → 1 ký tự, gộp 5 regex thành 1
+    _RE_REPEATED_PUNCT = re.compile(r'([!?~.\-])\1+')
+    
+    # Ngưỡng quyết định duplicate
+    SHORT_TEXT_SIMILARITY = 0.7        # Text ngắn: relaxed threshold
+    IMAGE_SIMILAR_THRESHOLD = 0.75     # Cho phép slight camera movement và animation
+    IMAGE_DIFFERENT_THRESHOLD = 0.5    # Dưới mức này = scene khác
+    OCR_VARIATION_THRESHOLD = 0.95     # Text gần như giống hệt = OCR variation
+    HASH_BITS = 64                     # pHash 8x8
+    
+    # Index các counter trong self._stats
+    _IDX_TOTAL = 0
+    _IDX_DUPS = 1
+    _IDX_SHORT = 2
+    _IDX_HITS = 3
+    _STAT_KEYS = ('total_checks', 'duplicates_found', 'short_text_processed', 'cache_hits')
+    
     def __init__(self, 
                  similarity_threshold=0.85,
                  short_text_threshold=30,
@@ -37,24 +108,38 @@ class AdvancedDeduplicator:
         self.time_window = time_window
         self.max_cache_size = max_cache_size
         
-        self.cache = deque(maxlen=max_cache_size)
-        
-        self.stats = {
-            'total_checks': 0,
-            'duplicates_found': 0,
-            'short_text_processed': 0,
-            'cache_hits': 0
-        }
+        # Cache dạng struct-of-arrays, entries xếp từ cũ → mới ở [0:_count]
+        # Cột số là numpy array liên tục - scan vectorized không duyệt Python objects
+        self._times = np.zeros(max_cache_size, dtype=np.float64)
+        self._image_hashes = np.zeros(max_cache_size, dtype=np.uint64)
+        self._text_hashes = np.zeros(max_cache_size, dtype=np.int64)
+        self._texts = [None] * max_cache_size
+        self._normalized = [None] * max_cache_size
+        self._count = 0
+        # Bảo vệ cache khi is_duplicate được gọi từ worker thread khác
+        # (hash ảnh chỉ dùng OpenCV/NumPy - các bước nặng đã nhả GIL)
+        self._lock = threading.Lock()
         
-        self.imagehash_available = IMAGEHASH_AVAILABLE
-        # Không log warning nữa - spam log
+        # Counters dạng list cố định (index theo _IDX_*), dict chỉ tạo khi get_stats
+        # List Python thay vì numpy array: += trên phần tử numpy là get/set scalar chậm hơn nhiều
+        self._stats = [0] * len(self._STAT_KEYS)
     
     def is_duplicate(self, text: str, image: np.ndarray, current_time: Optional[float] = None) -> Tuple[bool, str]:
-        """Kiểm tra duplicate"""
+        """
+        Kiểm tra duplicate - thread-safe
+        
+        Args:
+            image: Vùng capture (đã là vùng subtitle user chọn)
+        """
+        with self._lock:
+            return self._is_duplicate_locked(text, image, current_time)
+    
+    def _is_duplicate_locked(self, text: str, image: np.ndarray, current_time: Optional[float]) -> Tuple[bool, str]:
+        """Kiểm tra duplicate (caller giữ self._lock)"""
         if current_time is None:
             current_time = time.time()
         
-        self.stats['total_checks'] += 1
+        self._stats[self._IDX_TOTAL] += 1
         
         if not text or not text.strip():
             return True, "empty_text"
@@ -64,31 +149,65 @@ class AdvancedDeduplicator:
         
         is_short_text = text_len < self.short_text_threshold
         if is_short_text:
-            self.stats['short_text_processed'] += 1
+            self._stats[self._IDX_SHORT] += 1
         
         self._cleanup_cache(current_time)
         
-        if not self.cache:
-            self._add_to_cache(text, image, current_time)
+        # Normalize + hash 1 lần cho text mới - dùng lại khi add vào cache
+        # (cached entries đã lưu sẵn normalized form)
+        normalized = self._normalize_text_for_comparison(text)
+        text_hash = self._hash_normalized_text(normalized)
+        
+        if not self._count:
+            image_hash = self._compute_image_hash(image)
+            self._add_to_cache(text, normalized, text_hash, image_hash, current_time)
             return False, "cache_empty"
         
-        text_hash = self._compute_text_hash(text)
-        image_hash = self._compute_image_hash(image)
+        # Text exact match - 1 phép so sánh vectorized trên cột text hashes
+        if (self._text_hashes[:self._count] == text_hash).any():
+            self._stats[self._IDX_DUPS] += 1
+            self._stats[self._IDX_HITS] += 1
+            return True, "exact_text_match"
+        
+        normalized_len = len(normalized)
+        
+        # Short text: relaxed similarity threshold (0.7 thay vì 0.85)
+        # Vì short text dễ false positive với strict threshold
+        effective_threshold = self.SHORT_TEXT_SIMILARITY if is_short_text else self.similarity_threshold
+        
+        # Image hash (DCT - bước đắt nhất) + similarities với cả cache
+        # chỉ tính khi có entry text giống hoặc khi add vào cache
+        image_hash = None
+        image_similarities = None
+        
+        # RapidFuzz: tính similarity với toàn bộ cache trong 1 lời gọi C++
+        # (entries dưới score_cutoff trả về 0)
+        batch_scores = None
+        if RAPIDFUZZ_AVAILABLE:
+            try:
+                batch_scores = _rf_cdist(
+                    [normalized], self._normalized[:self._count],
+                    scorer=_rf_ratio, score_cutoff=effective_threshold * 100,
+                    dtype=np.float64, workers=1
+                )[0]
+            except Exception as e:
+                log_error(f"Error computing batch text similarity", e)
         
         # Check với từng entry trong cache (trong time window)
-        for cached_time, cached_text, cached_text_hash, cached_image_hash in self.cache:
-            # Text exact match
-            if text_hash == cached_text_hash:
-                self.stats['duplicates_found'] += 1
-                self.stats['cache_hits'] += 1
-                return True, "exact_text_match"
-            
-            # Text similarity check (dùng difflib)
-            text_similarity = self._compute_text_similarity(text, cached_text)
-            
-            # Short text: relaxed similarity threshold (0.7 thay vì 0.85)
-            # Vì short text dễ false positive với strict threshold
-            effective_threshold = 0.7 if is_short_text else self.similarity_threshold
+        for idx in range(self._count):
+            if batch_scores is not None:
+                text_similarity = float(batch_scores[idx]) / 100.0
+            else:
+                cached_normalized = self._normalized[idx]
+                # Length prefilter: edit distance >= ||a|-|b|| nên ratio <= 2*min/(|a|+|b|)
+                # Upper bound < threshold → chắc chắn không đạt, bỏ qua so sánh đắt
+                cached_len = len(cached_normalized)
+                total_len = normalized_len + cached_len
+                if total_len and 2 * min(normalized_len, cached_len) / total_len < effective_threshold:
+                    continue
+                
+                # Text similarity check (RapidFuzz / difflib)
+                text_similarity = self._compute_text_similarity(normalized, cached_normalized, effective_threshold)
             
             if text_similarity >= effective_threshold:
                 # Text rất giống - check image để xác nhận
@@ -97,12 +216,15 @@ class AdvancedDeduplicator:
                 #   - OCR variation (text_sim 0.85-0.95) → vẫn là duplicate
                 #   - Repeated dialogue (text_sim >= 0.98) → có thể là câu khác
                 
-                image_similarity = self._compute_image_similarity(image_hash, cached_image_hash)
+                if image_similarities is None:
+                    image_hash = self._compute_image_hash(image)
+                    image_similarities = self._compute_image_similarities(image_hash)
+                image_similarity = float(image_similarities[idx])
                 
                 # Image similarity threshold: 0.75 (cho phép slight camera movement và animation)
-                if image_similarity >= 0.75:
+                if image_similarity >= self.IMAGE_SIMILAR_THRESHOLD:
                     # Cả text và image giống → chắc chắn duplicate
-                    self.stats['duplicates_found'] += 1
+                    self._stats[self._IDX_DUPS] += 1
                     return True, f"text_image_similar (text={text_similarity:.2f}, img={image_similarity:.2f})"
                 else:
                     # Text giống nhưng image khác
@@ -110,199 +232,207 @@ class AdvancedDeduplicator:
                     
                     # Nếu text_similarity > 0.95 → gần như giống hệt → OCR variation
                     # → Vẫn coi là duplicate để tránh spam translation
-                    if text_similarity > 0.95:
-                        self.stats['duplicates_found'] += 1
+                    if text_similarity > self.OCR_VARIATION_THRESHOLD:
+                        self._stats[self._IDX_DUPS] += 1
                         return True, f"ocr_variation (text={text_similarity:.2f}, img={image_similarity:.2f})"
                     
                     # Nếu text_similarity ở mức 0.85-0.95 và image rất khác (<0.5)
                     # → Likely là repeated dialogue ở scene khác → KHÔNG duplicate
-                    if image_similarity < 0.5:
+                    if image_similarity < self.IMAGE_DIFFERENT_THRESHOLD:
                         # Không log - spam quá nhiều
-                        self._add_to_cache(text, image, current_time)
+                        self._add_to_cache(text, normalized, text_hash, image_hash, current_time)
                         return False, f"repeated_dialogue_different_scene"
                     
                     # Image similarity 0.5-0.75 và text similarity 0.85-0.95
                     # → Có thể là animation/camera movement với cùng text
                     # → Coi là duplicate để tránh spam
-                    self.stats['duplicates_found'] += 1
+                    self._stats[self._IDX_DUPS] += 1
                     return True, f"likely_same_dialogue (text={text_similarity:.2f}, img={image_similarity:.2f})"
         
         # Không match với cache nào - không phải duplicate
-        self._add_to_cache(text, image, current_time)
+        if image_hash is None:
+            image_hash = self._compute_image_hash(image)
+        self._add_to_cache(text, normalized, text_hash, image_hash, current_time)
         return False, "new_content"
     
-    def _compute_text_hash(self, text: str) -> str:
+    def _compute_text_hash(self, text: str) -> int:
         """Compute hash của text - normalize để ignore case và punctuation variations"""
-        import hashlib
         # Normalize: lowercase, loại bỏ emotion markers và excess punctuation
-        normalized = self._normalize_text_for_comparison(text)
-        return hashlib.md5(normalized.encode('utf-8', errors='ignore')).hexdigest()
+        return self._hash_normalized_text(self._normalize_text_for_comparison(text))
+    
+    def _hash_normalized_text(self, normalized: str) -> int:
+        """
+        Hash text đã normalize sẵn
+        Dedup không cần hash mật mã - builtin hash() (SipHash, C) ổn định trong 1 process
+        và được cache trên str object, không cần encode sang bytes như MD5
+        """
+        return hash(normalized)
     
     def _normalize_text_for_comparison(self, text: str) -> str:
         """Normalize text để so sánh - loại bỏ noise nhưng giữ nội dung chính"""
         try:
+            # NFC - dạng chuẩn, ổn định giữa các OCR engine (dấu tiếng Việt tổ hợp vs dựng sẵn)
             # Lowercase
-            normalized = text.lower().strip()
+            normalized = _unicode_normalize('NFC', text).lower()
             
             # Loại bỏ emotion markers: [action], (sound), **emotion**, *emphasis*
-            normalized = re.sub(r'\[[^\]]+\]|\([^\)]+\)|\*+[^\*]+\*+', '', normalized)
+            normalized = self._RE_EMOTION.sub('', normalized)
             
             # Normalize dấu câu: loại bỏ excess punctuation
-            # "Hi!!!" → "Hi!", "What???" → "What?", "Wait..." → "Wait."
-            normalized = re.sub(r'[!]{2,}', '!', normalized)  # !!! → !
-            normalized = re.sub(r'[?]{2,}', '?', normalized)  # ??? → ?
-            normalized = re.sub(r'[~]{2,}', '~', normalized)  # ~~~ → ~
-            normalized = re.sub(r'\.{2,}', '.', normalized)  # ... → .
-            normalized = re.sub(r'[-]{2,}', '-', normalized)  # -- → -
-            
-            # Loại bỏ whitespace excess
-            normalized = re.sub(r'\s+', ' ', normalized).strip()
+            # "Hi!!!" → "Hi!", "What???" → "What?", "Wait..." → "Wait.", "--" → "-"
+            normalized = self._RE_REPEATED_PUNCT.sub(r'\1', normalized)
             
-            return normalized
+            # Loại bỏ whitespace excess (split/join cũng strip 2 đầu)
+            return ' '.join(normalized.split())
         except Exception as e:
             log_error(f"Error normalizing text for comparison", e)
             return text.lower().strip()
     
-    def _compute_text_similarity(self, text1: str, text2: str) -> float:
+    def _compute_text_similarity(self, t1: str, t2: str, score_cutoff: float = 0.0) -> float:
         """
-        Compute text similarity dùng difflib SequenceMatcher
+        Compute text similarity dùng RapidFuzz (fallback difflib SequenceMatcher)
+        t1, t2: text đã qua _normalize_text_for_comparison
+        score_cutoff: RapidFuzz early-exit khi chắc chắn không đạt ngưỡng (trả về 0.0)
         Returns: 0.0-1.0 (1.0 = identical)
         """
         try:
-            # Normalize text để loại bỏ emotion markers và excess punctuation
-            t1 = self._normalize_text_for_comparison(text1)
-            t2 = self._normalize_text_for_comparison(text2)
+            if RAPIDFUZZ_AVAILABLE:
+                return _rf_ratio(t1, t2, score_cutoff=score_cutoff * 100) / 100.0
             
             # Dùng SequenceMatcher
-            matcher = difflib.SequenceMatcher(None, t1, t2)
+            matcher = _SequenceMatcher(None, t1, t2)
             return matcher.ratio()
         except Exception as e:
             log_error(f"Error computing text similarity", e)
             return 0.0
     
-    def _compute_image_hash(self, image: np.ndarray) -> str:
+    def _compute_image_hash(self, image: np.ndarray) -> int:
         """
-        Compute perceptual hash của image
+        Compute perceptual hash (pHash 64-bit) của image - chỉ dùng OpenCV
         Perceptual hash robust với:
         - Slight camera movement
         - Lighting changes
         - Compression artifacts
-        """
-        if not self.imagehash_available:
-            return self._fallback_image_hash(image)
         
+        Grayscale → resize 32x32 → DCT → 8x8 low-frequency > median
+        Không qua PIL: tránh copy full-resolution frame và BGR→RGB thừa
+        """
         try:
-            # Convert numpy array to PIL Image
-            if isinstance(image, np.ndarray):
-                # OpenCV BGR -> RGB
-                if len(image.shape) == 3 and image.shape[2] == 3:
-                    image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            if not isinstance(image, np.ndarray):
+                # PIL Image
+                image = np.asarray(image)
+            
+            # Ảnh lớn: decimate bằng strided view (~128px mỗi chiều) trước khi
+            # cvtColor/resize - pHash chỉ dùng 32x32 nên không mất thông tin cần thiết
+            h, w = image.shape[:2]
+            step = max(1, min(h, w) // 128)
+            if step > 1:
+                image = np.ascontiguousarray(image[::step, ::step])
+            
+            if len(image.shape) == 3:
+                if image.shape[2] == 4:
+                    gray = cv2.cvtColor(image, cv2.COLOR_BGRA2GRAY)
                 else:
-                    image_rgb = image
-                pil_image = Image.fromarray(image_rgb)
+                    gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             else:
-                pil_image = image
+                gray = image
+            
+            small = cv2.resize(gray, (32, 32), interpolation=cv2.INTER_AREA).astype(np.float32)
             
-            # Dùng phash (perceptual hash) - robust nhất cho video frames
             # phash dựa trên DCT, ít sensitive với minor changes
-            img_hash = imagehash.phash(pil_image, hash_size=8)
-            return str(img_hash)
-        except Exception as e:
-            log_error(f"Error computing perceptual hash, using fallback", e)
-            return self._fallback_image_hash(image)
-    
-    def _fallback_image_hash(self, image: np.ndarray) -> str:
-        """
-        Fallback hash method nếu imagehash không khả dụng
-        Dùng simple hash trên resized image
-        """
-        try:
-            import hashlib
-            # Resize về size nhỏ để hash
-            if isinstance(image, np.ndarray):
-                h, w = image.shape[:2]
-                small_img = cv2.resize(image, (16, 16), interpolation=cv2.INTER_NEAREST)
-                img_bytes = small_img.tobytes()
-            else:
-                # PIL Image
-                small_img = image.resize((16, 16), Image.Resampling.NEAREST)
-                img_bytes = small_img.tobytes()
+            dct_low = cv2.dct(small)[:8, :8].ravel()
+            # Median không tính DC component (độ sáng trung bình)
+            bits = dct_low > np.median(dct_low[1:])
             
-            return hashlib.md5(img_bytes).hexdigest()
+            # Pack 64 bits → int 64-bit - so sánh bằng XOR + popcount
+            return int.from_bytes(np.packbits(bits).tobytes(), 'big')
         except Exception as e:
-            log_error(f"Error in fallback image hash", e)
-            return "error_hash"
+            log_error(f"Error computing perceptual hash", e)
+            return _ERROR_HASH
     
-    def _compute_image_similarity(self, hash1: str, hash2: str) -> float:
+    def _compute_image_similarities(self, image_hash: int) -> np.ndarray:
         """
-        Compute similarity giữa 2 image hashes
-        Returns: 0.0-1.0 (1.0 = identical)
+        Compute similarity giữa image_hash và toàn bộ cache trong 1 vector op
+        Returns: mảng 0.0-1.0 theo thứ tự cache (1.0 = identical)
         """
-        if not self.imagehash_available:
-            # Fallback: exact match only
-            return 1.0 if hash1 == hash2 else 0.0
+        hashes = self._image_hashes[:self._count]
+        exact = hashes == np.uint64(image_hash)
         
-        try:
-            # Parse imagehash strings
-            import imagehash
-            ihash1 = imagehash.hex_to_hash(hash1)
-            ihash2 = imagehash.hex_to_hash(hash2)
-            
-            # Hamming distance (số bits khác nhau)
-            distance = ihash1 - ihash2
-            
-            # Convert to similarity (0-1)
-            # hash_size=8 → 64 bits total
-            max_distance = 64
-            similarity = 1.0 - (distance / max_distance)
-            return max(0.0, min(1.0, similarity))
-        except Exception as e:
-            log_error(f"Error computing image similarity", e)
-            return 1.0 if hash1 == hash2 else 0.0
+        if image_hash == _ERROR_HASH:
+            # Hash lỗi: exact match only
+            return exact.astype(np.float64)
+        
+        # Hamming distance (số bits khác nhau) = popcount(XOR)
+        distances = _popcount_u64(hashes ^ np.uint64(image_hash))
+        
+        # Convert to similarity (0-1)
+        # hash_size=8 → 64 bits total
+        similarities = 1.0 - (distances / self.HASH_BITS)
+        # Entry có hash lỗi chỉ match exact
+        return np.where(hashes == np.uint64(_ERROR_HASH), exact, similarities)
     
-    def _add_to_cache(self, text: str, image: np.ndarray, current_time: float):
-        """Add entry vào cache"""
+    def _add_to_cache(self, text: str, normalized: str, text_hash: int, image_hash: int, current_time: float):
+        """Add entry vào cache - hashes đã được tính sẵn trong is_duplicate"""
         try:
-            text_hash = self._compute_text_hash(text)
-            image_hash = self._compute_image_hash(image)
+            # Cache đầy → evict entry cũ nhất
+            if self._count == self.max_cache_size:
+                self._evict_oldest(1)
             
-            # Add to deque (auto evict oldest nếu full)
-            self.cache.append((current_time, text, text_hash, image_hash))
+            n = self._count
+            self._times[n] = current_time
+            self._image_hashes[n] = image_hash
+            self._text_hashes[n] = text_hash
+            self._texts[n] = text
+            # Lưu normalized form để không phải normalize lại mỗi lần so sánh
+            self._normalized[n] = normalized
+            self._count = n + 1
         except Exception as e:
             log_error(f"Error adding to cache", e)
     
+    def _evict_oldest(self, k: int):
+        """Xóa k entries cũ nhất, dồn các entries còn lại về đầu array"""
+        n = self._count - k
+        self._times[:n] = self._times[k:k + n]
+        self._image_hashes[:n] = self._image_hashes[k:k + n]
+        self._text_hashes[:n] = self._text_hashes[k:k + n]
+        # List: dồn lên và bỏ reference tới text cũ
+        del self._texts[:k]
+        self._texts.extend([None] * k)
+        del self._normalized[:k]
+        self._normalized.extend([None] * k)
+        self._count = n
+    
     def _cleanup_cache(self, current_time: float):
         """Xóa entries cũ hơn time_window khỏi cache"""
         cutoff_time = current_time - self.time_window
         
-        # Remove entries cũ hơn cutoff_time
-        while self.cache and self.cache[0][0] < cutoff_time:
-            self.cache.popleft()
+        # Timestamps tăng dần → binary search số entries cũ hơn cutoff_time
+        removed = int(np.searchsorted(self._times[:self._count], cutoff_time, side='left'))
+        if removed:
+            self._evict_oldest(removed)
     
     def clear_cache(self):
         """Clear toàn bộ cache"""
-        self.cache.clear()
+        with self._lock:
+            self._texts = [None] * self.max_cache_size
+            self._normalized = [None] * self.max_cache_size
+            self._count = 0
         log_debug("Advanced deduplicator cache cleared")
     
     def get_stats(self) -> dict:
         """Get statistics"""
-        if self.stats['total_checks'] > 0:
-            duplicate_rate = (self.stats['duplicates_found'] / self.stats['total_checks']) * 100
+        stats = dict(zip(self._STAT_KEYS, self._stats))
+        if stats['total_checks'] > 0:
+            duplicate_rate = (stats['duplicates_found'] / stats['total_checks']) * 100
         else:
             duplicate_rate = 0.0
         
         return {
-            **self.stats,
+            **stats,
             'duplicate_rate': duplicate_rate,
-            'cache_size': len(self.cache),
-            'imagehash_available': self.imagehash_available
+            'cache_size': self._count
         }
     
     def reset_stats(self):
         """Reset statistics"""
-        self.stats = {
-            'total_checks': 0,
-            'duplicates_found': 0,
-            'short_text_processed': 0,
-            'cache_hits': 0
-        }
+        self._stats[:] = [0] * len(self._STAT_KEYS)
@@ -1,9 +1,26 @@
 """Batch Translation Utilities"""
 import re
+import time
+import threading
+from collections import OrderedDict
 from .logger import log_debug, log_error
 
-def split_into_sentences(text, max_sentences_per_batch=10):
-    """Tách text thành các câu, preserve emotion markers và dialogue patterns"""
+# Regex compile 1 lần ở module level - split_into_sentences gọi mỗi subtitle
+# Chỉ split tại . ! ? và ellipsis (không split tại ~ vì là emotion marker)
+_SENT_SPLIT_RE = re.compile(r'([.!?…]+[\s\n]*)')
+_SENT_COUNT_RE = re.compile(r'[.!?…]+')
+_SENT_DELIMS = frozenset('.!?…')
+
+# Backoff giữa các lần retry DeepL (giây) - index theo attempt
+_RETRY_BACKOFF = (0.1, 0.2, 0.3)
+
+def split_into_sentences(text, max_sentences_per_batch=10, enable_split=True):
+    """
+    Tách text thành các câu, preserve emotion markers và dialogue patterns
+    
+    enable_split=False: trả nguyên text thành 1 batch 1 phần tử - cho provider tự tách câu
+    (DeepL nhận list text dài tùy ý và segment nội bộ)
+    """
     try:
         if not text or len(str(text).strip()) < 2:
             return []
@@ -13,33 +30,44 @@ def split_into_sentences(text, max_sentences_per_batch=10):
             if not text or len(text.strip()) < 2:
                 return []
         
+        if not enable_split:
+            return [[text.strip()]]
+        
         # Split by sentence boundaries: . ! ? ~ ... or …
         # Keep the punctuation with the sentence
         # Note: Không split tại ~ nếu nó là emotion marker (Hi~, Thanks~)
         # Chỉ split tại . ! ? và ellipsis (...)
-        sentence_pattern = r'([.!?…]+[\s\n]*)'
-        parts = re.split(sentence_pattern, text)
+        if _SENT_DELIMS.isdisjoint(text):
+            # Không có dấu câu (vd. text dài > 1000 ký tự OCR thiếu dấu chấm)
+            # → cả text là 1 câu, bỏ qua regex engine
+            parts = [text]
+        else:
+            parts = _SENT_SPLIT_RE.split(text)
         
         sentences = []
         current_sentence = ""
         
+        # re.split với capturing group trả về xen kẽ text/dấu câu/text/...
+        # → index lẻ luôn là dấu câu, không cần match lại từng part
         for i, part in enumerate(parts):
-            if re.match(sentence_pattern, part):
+            if i & 1:
                 # This is punctuation, add to current sentence
                 current_sentence += part
-                if current_sentence.strip():
-                    sentences.append(current_sentence.strip())
+                stripped = current_sentence.strip()
+                if stripped:
+                    sentences.append(stripped)
                     current_sentence = ""
             else:
                 # This is text, add to current sentence
                 current_sentence += part
         
         # Add remaining text if any
-        if current_sentence.strip():
-            sentences.append(current_sentence.strip())
+        stripped = current_sentence.strip()
+        if stripped:
+            sentences.append(stripped)
         
-        # Filter out empty sentences
-        sentences = [s for s in sentences if s and len(s.strip()) >= 2]
+        # Filter out quá ngắn (sentences đã strip sẵn)
+        sentences = [s for s in sentences if len(s) >= 2]
         
         if not sentences:
             return []
@@ -73,7 +101,79 @@ def split_into_sentences(text, max_sentences_per_batch=10):
         # Return empty list on error
         return []
 
-def translate_batch_google(translator, sentences, max_retries=2):
+# LRU cache bản dịch theo từng câu - subtitle lặp lại nhiều câu ngắn ("Yes.", tên nhân vật...)
+# Key gồm id(client) + target_lang → tự invalidate khi translator được tạo lại / đổi ngôn ngữ
+_SENTENCE_CACHE_MAX = 4096
+_sentence_cache = OrderedDict()
+_sentence_cache_lock = threading.Lock()  # translation_thread_pool gọi từ nhiều thread
+
+def _sentence_cache_get(key):
+    """Lấy bản dịch đã cache (None nếu miss)"""
+    with _sentence_cache_lock:
+        value = _sentence_cache.get(key)
+        if value is not None:
+            _sentence_cache.move_to_end(key)
+        return value
+
+def _sentence_cache_put(key, value):
+    """Lưu bản dịch, evict entry ít dùng nhất khi đầy"""
+    if not value:
+        return
+    with _sentence_cache_lock:
+        _sentence_cache[key] = value
+        _sentence_cache.move_to_end(key)
+        if len(_sentence_cache) > _SENTENCE_CACHE_MAX:
+            _sentence_cache.popitem(last=False)
+
+def clear_sentence_cache():
+    """Xóa cache bản dịch theo câu"""
+    with _sentence_cache_lock:
+        _sentence_cache.clear()
+
+# Giới hạn ký tự cho 1 request Google (deep-translator chặn ở 5000)
+_GOOGLE_JOIN_MAX_CHARS = 4500
+
+def _translate_google_joined(translator, texts):
+    """
+    Dịch nhiều câu trong 1 request bằng cách nối bằng newline rồi split lại
+    
+    Returns:
+        List bản dịch cùng thứ tự với texts, hoặc None nếu không dùng được (để fallback)
+    """
+    indices = []
+    lines = []
+    for i, text in enumerate(texts):
+        if text and len(text.strip()) >= 2:
+            indices.append(i)
+            # Newline trong câu sẽ làm lệch số dòng → thay bằng space
+            lines.append(" ".join(text.split()))
+    
+    if len(lines) < 2:
+        return None
+    
+    payload = "\n".join(lines)
+    if len(payload) > _GOOGLE_JOIN_MAX_CHARS:
+        return None
+    
+    try:
+        translated = translator.translate(payload)
+    except Exception as e:
+        log_debug(f"Google Translate joined request failed, fallback per sentence: {e}")
+        return None
+    
+    if not translated or not isinstance(translated, str):
+        return None
+    
+    translated_lines = [line.strip() for line in translated.split("\n") if line.strip()]
+    if len(translated_lines) != len(lines):
+        return None
+    
+    result = [""] * len(texts)
+    for idx, line in zip(indices, translated_lines):
+        result[idx] = line
+    return result
+
+def translate_batch_google(translator, sentences, max_retries=2, target_lang=None):
     """
     Translate a batch of sentences using Google Translate.
     
@@ -81,6 +181,7 @@ def translate_batch_google(translator, sentences, max_retries=2):
         translator: GoogleTranslator instance
         sentences: List of sentences to translate
         max_retries: Maximum retry attempts
+        target_lang: Target language code (dùng làm cache key)
     
     Returns:
         List of translated sentences, or None if failed
@@ -89,12 +190,8 @@ def translate_batch_google(translator, sentences, max_retries=2):
         return []
     
     try:
-        # Google Translate can translate multiple texts
-        # Join sentences with a special separator, translate, then split
-        # Note: deep-translator's GoogleTranslator.translate() handles single text
-        # For batch, we need to call translate() for each sentence but do it efficiently
-        
-        translated_sentences = []
+        # Chuẩn hóa input - sentence có thể là list (từ batches) hoặc non-str
+        texts = []
         for sentence in sentences:
             # Handle case where sentence might be a list (from batches)
             if isinstance(sentence, list):
@@ -103,26 +200,58 @@ def translate_batch_google(translator, sentences, max_retries=2):
             elif not isinstance(sentence, str):
                 # Convert to string if not already
                 sentence = str(sentence) if sentence else ""
-            
-            if not sentence or len(sentence.strip()) < 2:
-                translated_sentences.append("")
+            texts.append(sentence.strip())
+        
+        # Lấy các câu đã dịch từ cache, chỉ gửi câu miss lên API
+        # Câu giống hệt nhau ("Yes.", "...") chỉ dịch 1 lần: sentence -> các index cần điền
+        translated_sentences = [""] * len(texts)
+        cache_prefix = ('google', id(translator), target_lang)
+        pending = {}
+        for i, sentence in enumerate(texts):
+            if not sentence or len(sentence) < 2:
                 continue
-            
+            cached = _sentence_cache_get(cache_prefix + (sentence,))
+            if cached is not None:
+                translated_sentences[i] = cached
+            elif sentence in pending:
+                pending[sentence].append(i)
+            else:
+                pending[sentence] = [i]
+        
+        if not pending:
+            log_debug(f"Google Translate batch: {len(sentences)} sentences from cache")
+            return translated_sentences
+        
+        unique_sentences = list(pending)
+        
+        # Fast path: nối các câu bằng newline → 1 request duy nhất thay vì N request tuần tự
+        # Google giữ nguyên line breaks, nên split lại theo dòng được đúng số câu
+        joined = _translate_google_joined(translator, unique_sentences)
+        if joined is not None:
+            for sentence, translated in zip(unique_sentences, joined):
+                for i in pending[sentence]:
+                    translated_sentences[i] = translated
+                _sentence_cache_put(cache_prefix + (sentence,), translated)
+            log_debug(f"Google Translate batch: {len(unique_sentences)}/{len(sentences)} sentences translated (1 request)")
+            return translated_sentences
+        
+        # Fallback: dịch từng câu (số dòng trả về không khớp hoặc request gộp lỗi)
+        for sentence in unique_sentences:
             for attempt in range(max_retries):
                 try:
                     translated = translator.translate(sentence)
                     if translated and isinstance(translated, str) and len(translated.strip()) > 0:
-                        translated_sentences.append(translated.strip())
+                        translated = translated.strip()
+                        for i in pending[sentence]:
+                            translated_sentences[i] = translated
+                        _sentence_cache_put(cache_prefix + (sentence,), translated)
                         break
-                    elif attempt == max_retries - 1:
-                        translated_sentences.append("")
                 except Exception as e:
                     if attempt == max_retries - 1:
                         log_error(f"Google Translate batch failed for sentence: {sentence[:50]}...", e)
-                        translated_sentences.append("")
                     # Không sleep - retry ngay để nhanh hơn
         
-        log_debug(f"Google Translate batch: {len(sentences)} sentences translated")
+        log_debug(f"Google Translate batch: {len(unique_sentences)}/{len(sentences)} sentences translated")
         return translated_sentences
         
     except Exception as e:
@@ -150,6 +279,8 @@ def translate_batch_deepl(deepl_client, sentences, target_lang, max_retries=2):
         # Filter out empty sentences
         non_empty_sentences = []
         sentence_indices = []
+        translated_sentences = [""] * len(sentences)
+        cache_prefix = ('deepl', id(deepl_client), target_lang)
         for i, sentence in enumerate(sentences):
             # Handle case where sentence might be a list (from batches)
             if isinstance(sentence, list):
@@ -159,12 +290,18 @@ def translate_batch_deepl(deepl_client, sentences, target_lang, max_retries=2):
                 # Convert to string if not already
                 sentence = str(sentence) if sentence else ""
             
-            if sentence and len(sentence.strip()) >= 2:
-                non_empty_sentences.append(sentence.strip())
+            sentence = sentence.strip()
+            if len(sentence) >= 2:
+                # Câu đã dịch → lấy từ cache, không gửi lại lên API
+                cached = _sentence_cache_get(cache_prefix + (sentence,))
+                if cached is not None:
+                    translated_sentences[i] = cached
+                    continue
+                non_empty_sentences.append(sentence)
                 sentence_indices.append(i)
         
         if not non_empty_sentences:
-            return [""] * len(sentences)
+            return translated_sentences
         
         # Translate batch using DeepL
         for attempt in range(max_retries):
@@ -177,23 +314,29 @@ def translate_batch_deepl(deepl_client, sentences, target_lang, max_retries=2):
                 )
                 
                 # Process results
-                translated_sentences = [""] * len(sentences)
-                
                 if isinstance(results, list):
-                    # Multiple results
-                    for i, result in enumerate(results):
-                        if i < len(sentence_indices):
-                            idx = sentence_indices[i]
-                            if result and hasattr(result, 'text'):
-                                translated_sentences[idx] = result.text
-                            elif isinstance(result, str):
-                                translated_sentences[idx] = result
+                    # Multiple results - list đồng nhất (DeepL luôn trả TextResult)
+                    # → kiểm tra kiểu 1 lần trên phần tử đầu thay vì từng phần tử
+                    if results and hasattr(results[0], 'text'):
+                        texts = [result.text for result in results]
+                    elif results and isinstance(results[0], str):
+                        texts = results
+                    else:
+                        texts = [
+                            result.text if hasattr(result, 'text') else (result if isinstance(result, str) else "")
+                            for result in results
+                        ]
+                    
+                    for idx, sentence, text in zip(sentence_indices, non_empty_sentences, texts):
+                        translated_sentences[idx] = text
+                        _sentence_cache_put(cache_prefix + (sentence,), text)
                 elif results:
                     # Single result (shouldn't happen with list input, but handle it)
                     if hasattr(results, 'text'):
                         translated_sentences[sentence_indices[0]] = results.text
                     elif isinstance(results, str):
                         translated_sentences[sentence_indices[0]] = results
+                    _sentence_cache_put(cache_prefix + (non_empty_sentences[0],), translated_sentences[sentence_indices[0]])
                 
                 log_debug(f"DeepL batch: {len(non_empty_sentences)} sentences translated")
                 return translated_sentences
@@ -203,8 +346,7 @@ def translate_batch_deepl(deepl_client, sentences, target_lang, max_retries=2):
                     log_error("DeepL batch translation failed after retries", e)
                     return None
                 else:
-                    import time
-                    time.sleep(0.1 * (attempt + 1))
+                    time.sleep(_RETRY_BACKOFF[min(attempt, len(_RETRY_BACKOFF) - 1)])
         
         return None
         
@@ -223,13 +365,29 @@ def should_use_batch_translation(text, min_sentences=3):
     Returns:
         True if batch translation should be used
     """
-    if not text or len(text.strip()) < 10:
+    if not text:
         return False
     
-    # Count sentences (không đếm ~ vì là emotion marker, chỉ đếm . ! ? ...)
-    sentence_count = len(re.findall(r'[.!?…]+', text))
+    # Kiểm tra độ dài trước - rẻ hơn mọi bước scan dấu câu
+    text_len = len(text)
+    if text_len < 10 or len(text.strip()) < 10:
+        return False
     
     # Use batch if we have 3+ sentences or text is very long (>1000 chars)
     # Với 1-2 câu ngắn, dịch trực tiếp nhanh hơn
-    return sentence_count >= min_sentences or len(text) > 1000
+    if text_len > 1000:
+        return True
+    
+    # < 30 ký tự: không có 3 câu thực sự (chỉ là "Hi. Yes. No.") → dịch trực tiếp
+    if text_len < 30:
+        return False
+    
+    # Count sentences (không đếm ~ vì là emotion marker, chỉ đếm . ! ? ...)
+    # str.count (C, không tạo list) đếm từng ký tự → luôn >= số cụm dấu câu
+    # Nếu vẫn < min_sentences thì chắc chắn không đủ câu, không cần regex
+    if (text.count('.') + text.count('!') + text.count('?') + text.count('…')) < min_sentences:
+        return False
+    
+    sentence_count = len(_SENT_COUNT_RE.findall(text))
+    return sentence_count >= min_sentences
 
@@ -7,26 +7,35 @@ from .logger import log_debug, log_error
 class NetworkCircuitBreaker:
     """Circuit breaker nhẹ - chỉ mở khi network thực sự có vấn đề."""
     
-    def __init__(self):
+    # Fixed attributes - không cần __dict__ per instance, record_call gọi mỗi translate
+    __slots__ = (
+        'failure_count', 'slow_call_count', 'last_reset', 'is_open',
+        'total_calls', 'success_count', 'failure_threshold',
+        'slow_call_threshold', 'slow_duration', 'reset_interval',
+        'recovery_success_count',
+    )
+    
+    def __init__(self, failure_threshold=15, slow_call_threshold=30,
+                 slow_duration=8.0, reset_interval=120, recovery_success_count=3):
         self.failure_count = 0
         self.slow_call_count = 0
-        self.last_reset = time.time()
+        self.last_reset = time.monotonic()  # monotonic: không nhảy lùi khi đồng bộ giờ hệ thống
         self.is_open = False
         self.total_calls = 0
         self.success_count = 0  # Đếm success để auto-close circuit
         
-        # RELAXED THRESHOLDS - API rất ổn định
-        self.failure_threshold = 15      # 15 failures liên tiếp mới mở (tăng từ 5)
-        self.slow_call_threshold = 30    # 30 slow calls mới mở (tăng từ 10)
-        self.slow_duration = 8.0         # 8s mới coi là slow (tăng từ 3s)
-        self.reset_interval = 120        # Reset mỗi 2 phút (giảm từ 5 phút)
-        self.recovery_success_count = 3  # 3 success liên tiếp → auto close circuit
+        # RELAXED THRESHOLDS (default) - API rất ổn định
+        self.failure_threshold = failure_threshold            # 15 failures liên tiếp mới mở (tăng từ 5)
+        self.slow_call_threshold = slow_call_threshold        # 30 slow calls mới mở (tăng từ 10)
+        self.slow_duration = slow_duration                    # 8s mới coi là slow (tăng từ 3s)
+        self.reset_interval = reset_interval                  # Reset mỗi 2 phút (giảm từ 5 phút)
+        self.recovery_success_count = recovery_success_count  # 3 success liên tiếp → auto close circuit
     
     def record_call(self, duration, success):
         """Ghi nhận kết quả API call - relaxed logic."""
         try:
             self.total_calls += 1
-            current_time = time.time()
+            current_time = time.monotonic()
             
             # Reset counters định kỳ
             if current_time - self.last_reset > self.reset_interval:
@@ -84,7 +93,7 @@ class NetworkCircuitBreaker:
             self.slow_call_count = 0
             self.success_count = 0
             self.is_open = False
-            self.last_reset = time.time()
+            self.last_reset = time.monotonic()
         except Exception as e:
             log_error("Error resetting circuit breaker", e)
 
@@ -3,14 +3,28 @@ DeepL Context Window Manager
 Manages context window for DeepL translation to improve dialogue quality
 """
 import re
+from collections import deque
 from .logger import log_debug, log_error
 
+# Regex compile 1 lần ở module level - dùng mỗi lần update/build context
+# Emotion markers: [action], (sound), **emotion**, *emphasis*
+# Giới hạn độ dài + không qua dòng → không backtrack bậc 2 trên chuỗi '*****' không đóng
+_EMOTION_RE = re.compile(r'\[[^\]\n]{1,200}\]|\([^)\n]{1,200}\)|\*{1,4}[^*\n]{1,200}\*{1,4}')
+_WS_RE = re.compile(r'\s+')
+# Chuỗi lặp của cùng 1 dấu câu (!! ?? ~~ ..) → 1 ký tự, gộp 4 lần sub thành 1
+_PUNCT_RUN_RE = re.compile(r'([!?~.])\1+')
+
 class DeepLContextManager:
     """
     Manages DeepL context window for improved translation quality.
     Context window stores previous source texts to provide context for current translation.
     """
     
+    __slots__ = (
+        'max_context_size', 'context_window', '_last_source', '_last_normalized',
+        'current_source_lang', 'current_target_lang',
+    )
+    
     def __init__(self, max_context_size=3):
         """
         Initialize DeepL context manager.
@@ -19,7 +33,11 @@ class DeepLContextManager:
             max_context_size: Maximum number of previous subtitles to keep (0-3)
         """
         self.max_context_size = max(0, min(3, max_context_size))  # Clamp to 0-3
-        self.context_window = []  # List of source texts only
+        # Source texts only - giữ tối đa 5 (nhiều hơn max context setting để linh hoạt)
+        # deque(maxlen) tự evict entry cũ khi append, không cần slice tạo list mới
+        self.context_window = deque(maxlen=5)
+        self._last_source = ""  # context_window[-1] - so khớp nguyên văn trước khi normalize
+        self._last_normalized = ""  # Normalized form của context_window[-1] - tránh normalize lại
         self.current_source_lang = None
         self.current_target_lang = None
         
@@ -30,13 +48,10 @@ class DeepLContextManager:
         try:
             normalized = text.lower().strip()
             # Loại bỏ emotion markers: [action], (sound), **emotion**
-            normalized = re.sub(r'\[[^\]]+\]|\([^\)]+\)|\*+[^\*]+\*+', '', normalized)
+            normalized = _EMOTION_RE.sub('', normalized)
             # Normalize excess punctuation
-            normalized = re.sub(r'[!]{2,}', '!', normalized)
-            normalized = re.sub(r'[?]{2,}', '?', normalized)
-            normalized = re.sub(r'[~]{2,}', '~', normalized)
-            normalized = re.sub(r'\.{2,}', '.', normalized)
-            normalized = re.sub(r'\s+', ' ', normalized).strip()
+            normalized = _PUNCT_RUN_RE.sub(r'\1', normalized)
+            normalized = _WS_RE.sub(' ', normalized).strip()
             return normalized
         except Exception as e:
             log_error("Error normalizing text for dedup", e)
@@ -46,9 +61,9 @@ class DeepLContextManager:
         """Clean text để dùng làm context (loại bỏ emotion markers nhưng giữ punctuation)"""
         try:
             # Loại bỏ emotion markers: [action], (sound), **emotion**, *emphasis*
-            cleaned = re.sub(r'\[[^\]]+\]|\([^\)]+\)|\*+[^\*]+\*+', '', text)
+            cleaned = _EMOTION_RE.sub('', text)
             # Loại bỏ excess whitespace
-            cleaned = re.sub(r'\s+', ' ', cleaned).strip()
+            cleaned = _WS_RE.sub(' ', cleaned).strip()
             return cleaned if cleaned else text
         except Exception as e:
             log_error("Error cleaning text for context", e)
@@ -66,8 +81,11 @@ class DeepLContextManager:
             self.max_context_size = max(0, min(3, size))
             
             # Trim context window if new size is smaller
-            if self.max_context_size < len(self.context_window):
-                self.context_window = self.context_window[-self.max_context_size:]
+            while len(self.context_window) > self.max_context_size:
+                self.context_window.popleft()
+            if not self.context_window:
+                self._last_source = ""
+                self._last_normalized = ""
             
             if old_size != self.max_context_size:
                 log_debug(f"DeepL context size changed from {old_size} to {self.max_context_size}")
@@ -77,7 +95,9 @@ class DeepLContextManager:
     def clear_context(self):
         """Clear context window (called on language change or session end)."""
         try:
-            self.context_window = []
+            self.context_window.clear()
+            self._last_source = ""
+            self._last_normalized = ""
             self.current_source_lang = None
             self.current_target_lang = None
             log_debug("DeepL context cleared")
@@ -112,7 +132,7 @@ class DeepLContextManager:
                 return None
             
             # Get last N source texts và clean chúng (loại bỏ emotion markers)
-            context_texts = self.context_window[-context_size:]
+            context_texts = list(self.context_window)[-context_size:]
             cleaned_texts = [self._clean_text_for_context(t) for t in context_texts]
             # Filter out empty texts sau khi clean
             cleaned_texts = [t for t in cleaned_texts if t and len(t.strip()) > 0]
@@ -159,16 +179,21 @@ class DeepLContextManager:
                     self.current_target_lang = target_lang
             
             # Check for duplicate (same as last subtitle) - dùng normalized text
+            # (normalized của entry cuối đã lưu sẵn khi append)
             if self.context_window:
+                # Subtitle lặp nguyên văn (trường hợp phổ biến) → bỏ qua luôn, không cần normalize
+                if source_text == self._last_source:
+                    return
                 normalized_new = self._normalize_for_dedup(source_text)
-                normalized_last = self._normalize_for_dedup(self.context_window[-1])
-                if normalized_new == normalized_last:
+                if normalized_new == self._last_normalized:
                     return
+            else:
+                normalized_new = self._normalize_for_dedup(source_text)
             
+            # deque(maxlen=5) tự bỏ entry cũ nhất khi đầy
             self.context_window.append(source_text)
-            
-            # Keep only last 5 texts (more than max context setting for flexibility)
-            self.context_window = self.context_window[-5:]
+            self._last_source = source_text
+            self._last_normalized = normalized_new
         except Exception as e:
             log_error("Error updating DeepL context", e)
     
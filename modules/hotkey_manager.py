@@ -5,9 +5,80 @@ Supports customizable hotkeys with validation
 """
 
 import threading
+import time
+from collections import namedtuple
+from functools import lru_cache
 from pynput import keyboard
 from modules import log_error, log_debug
 
+# Map to both left and right variants for modifiers
+_MODIFIER_MAPPING = {
+    '<ctrl>': (keyboard.Key.ctrl_l, keyboard.Key.ctrl_r, keyboard.Key.ctrl),
+    '<control>': (keyboard.Key.ctrl_l, keyboard.Key.ctrl_r, keyboard.Key.ctrl),
+    '<alt>': (keyboard.Key.alt_l, keyboard.Key.alt_r, keyboard.Key.alt, keyboard.Key.alt_gr),
+    '<shift>': (keyboard.Key.shift, keyboard.Key.shift_l, keyboard.Key.shift_r),
+    '<cmd>': (keyboard.Key.cmd, keyboard.Key.cmd_l, keyboard.Key.cmd_r),
+    '<win>': (keyboard.Key.cmd, keyboard.Key.cmd_l, keyboard.Key.cmd_r),
+}
+
+# Bit cho từng nhóm modifier - hotkey chỉ cần biết nhóm nào đang giữ, không cần biến thể trái/phải
+_MOD_CTRL = 1
+_MOD_ALT = 2
+_MOD_SHIFT = 4
+_MOD_CMD = 8
+_MODIFIER_BITS = {
+    '<ctrl>': _MOD_CTRL, '<control>': _MOD_CTRL,
+    '<alt>': _MOD_ALT,
+    '<shift>': _MOD_SHIFT,
+    '<cmd>': _MOD_CMD, '<win>': _MOD_CMD,
+}
+# Key variant → bit
+_KEY_MOD_BITS = {
+    key: _MODIFIER_BITS[name]
+    for name, variants in _MODIFIER_MAPPING.items()
+    for key in variants
+}
+
+# VK A-Z / 0-9 (Windows, KeyCode không có char) → KeyCode char lowercase, tạo 1 lần
+_VK_KEYCODES = {
+    vk: keyboard.KeyCode.from_char(chr(vk).lower())
+    for vk in list(range(48, 58)) + list(range(65, 91))
+}
+
+@lru_cache(maxsize=256)
+def _char_keycode(char):
+    """Char → lowercase KeyCode - cache để không tạo KeyCode mới mỗi lần nhấn phím"""
+    return keyboard.KeyCode.from_char(char.lower())
+
+@lru_cache(maxsize=64)
+def _parse_hotkey_cached(hotkey_str):
+    """Parse hotkey string - pure function của string nên cache kết quả (frozenset, immutable)"""
+    keys = set()
+    parts = hotkey_str.lower().replace(' ', '').split('+')
+    
+    for part in parts:
+        if part in _MODIFIER_MAPPING:
+            # For modifiers, we'll check if ANY variant is pressed
+            # Store as tuple to mark it as "any of these"
+            keys.add(('modifier', _MODIFIER_MAPPING[part]))
+        else:
+            # Regular key
+            part_clean = part.strip('<>')
+            if len(part_clean) == 1:
+                # Create KeyCode for the character
+                keys.add(keyboard.KeyCode.from_char(part_clean))
+            else:
+                # Function keys, etc
+                try:
+                    keys.add(getattr(keyboard.Key, part_clean))
+                except AttributeError:
+                    log_error(f"Unknown key: {part_clean}", None)
+    
+    return frozenset(keys)
+
+# Snapshot cấu hình hotkey - immutable sau khi build
+HotkeyConfig = namedtuple('HotkeyConfig', 'hotkeys parsed trigger_index modifier_only')
+
 class HotkeyManager:
     """Quản lý hotkeys toàn cục với khả năng tùy chỉnh"""
     
@@ -21,6 +92,12 @@ class HotkeyManager:
         'toggle_lock': '<ctrl>+<alt>+l'
     }
     
+    # Khoảng cách tối thiểu giữa 2 lần trigger cùng action (giây) - chống chord chatter
+    MIN_INTERVAL_S = 0.15
+    # Press lặp lại của phím đang giữ trong khoảng này (giây) = auto-repeat (mỗi lần repeat
+    # làm mới mốc thời gian). Lâu hơn → coi là lần nhấn mới (release trước đó bị mất)
+    REPEAT_WINDOW_S = 1.0
+    
     def __init__(self, callback_map=None, root=None):
         """
         Initialize hotkey manager
@@ -31,13 +108,16 @@ class HotkeyManager:
             root: Tkinter root window for thread-safe callbacks
         """
         self.callback_map = callback_map or {}
-        self.hotkeys = self.DEFAULT_HOTKEYS.copy()
         self.listener = None
         self.active_keys = set()
         self.running = False
-        self._lock = threading.Lock()
+        self._lock = threading.Lock()  # Bảo vệ trạng thái phím khi matching trong on_press
+        self._config_lock = threading.Lock()
         self.root = root
-        self.triggered_hotkeys = set()  # Track recently triggered hotkeys to prevent spam
+        # Bit của các hotkeys vừa trigger (chống spam) - reset bằng 1 phép gán khi thả phím
+        self._triggered_mask = 0
+        self._last_fired = {}  # action -> time.monotonic() lần trigger gần nhất
+        self._last_press = {}  # phím (normalized) -> time.monotonic() lần press gần nhất
         # Define modifier keys set (both left/right variants)
         self.modifier_keys = {
             keyboard.Key.ctrl, keyboard.Key.ctrl_l, keyboard.Key.ctrl_r,
@@ -45,6 +125,55 @@ class HotkeyManager:
             keyboard.Key.shift, keyboard.Key.shift_l, keyboard.Key.shift_r,
             keyboard.Key.cmd, keyboard.Key.cmd_l, keyboard.Key.cmd_r
         }
+        # Bitmask các nhóm modifier đang giữ (_MOD_CTRL | _MOD_ALT ...)
+        self._active_mod_mask = 0
+        # Config immutable (hotkeys + parsed + trigger index) - set_hotkeys tạo object mới
+        # và gán 1 lần (atomic trong CPython) → listener đọc không cần lock
+        self._config = self._build_config(self.DEFAULT_HOTKEYS.copy())
+    
+    @property
+    def hotkeys(self):
+        """Hotkeys hiện tại {action: hotkey_string} (read-only snapshot)"""
+        return self._config.hotkeys
+    
+    def _build_config(self, hotkeys):
+        """Parse hotkeys và build HotkeyConfig mới"""
+        parsed = {
+            action: self.parse_hotkey(hotkey_str)
+            for action, hotkey_str in hotkeys.items()
+        }
+        
+        # Reverse index {phím chính: [(action, bit, modifier mask, phím chính khác cần giữ)]}
+        # → mỗi lần nhấn chỉ xét các hotkey có phím đó, không duyệt toàn bộ
+        # bit = 1 << index của action, dùng cho _triggered_mask
+        trigger_index = {}
+        # Hotkey chỉ gồm modifier (vd. '<ctrl>+<shift>') không có phím chính để index
+        # → giữ hành vi cũ: xét ở mọi lần nhấn phím không phải modifier
+        modifier_only = []
+        for index, (action, expected_keys) in enumerate(parsed.items()):
+            action_bit = 1 << index
+            mask = 0
+            main_keys = []
+            for expected in expected_keys:
+                if isinstance(expected, tuple) and expected[0] == 'modifier':
+                    mask |= _KEY_MOD_BITS[expected[1][0]]
+                else:
+                    main_keys.append(expected)
+            for main_key in main_keys:
+                others = frozenset(k for k in main_keys if k != main_key)
+                trigger_index.setdefault(main_key, []).append((action, action_bit, mask, others))
+            if not main_keys:
+                modifier_only.append((action, action_bit, mask, frozenset()))
+        
+        return HotkeyConfig(hotkeys, parsed, trigger_index, tuple(modifier_only))
+    
+    def _update_mod_mask(self):
+        """Tính lại modifier mask từ active_keys (chỉ gọi khi modifier nhấn/thả)"""
+        mask = 0
+        # tuple() copy trong C - an toàn nếu stop() clear active_keys từ thread khác
+        for active_key in tuple(self.active_keys):
+            mask |= _KEY_MOD_BITS.get(active_key, 0)
+        self._active_mod_mask = mask
 
     def _is_modifier(self, key):
         """Check if a key is a modifier"""
@@ -61,15 +190,17 @@ class HotkeyManager:
         Args:
             hotkey_config: Dict {'action': 'hotkey_string', ...}
         """
-        with self._lock:
+        # Lock chỉ để serialize các lần set_hotkeys - listener đọc snapshot không lock
+        with self._config_lock:
+            hotkeys = self._config.hotkeys.copy()
             for action, hotkey_str in hotkey_config.items():
                 if action in self.DEFAULT_HOTKEYS:
-                    self.hotkeys[action] = hotkey_str
+                    hotkeys[action] = hotkey_str
+            self._config = self._build_config(hotkeys)
     
     def get_hotkeys(self):
         """Lấy danh sách hotkeys hiện tại"""
-        with self._lock:
-            return self.hotkeys.copy()
+        return self._config.hotkeys.copy()
     
     def register_callback(self, action, callback):
         """
@@ -89,40 +220,9 @@ class HotkeyManager:
             hotkey_str: String như '<ctrl>+<alt>+s' hoặc '<shift>+f1'
         
         Returns:
-            Set of keyboard.Key or keyboard.KeyCode objects
+            Frozenset of keyboard.Key or keyboard.KeyCode objects
         """
-        keys = set()
-        parts = hotkey_str.lower().replace(' ', '').split('+')
-        
-        # Map to both left and right variants for modifiers
-        key_mapping = {
-            '<ctrl>': [keyboard.Key.ctrl_l, keyboard.Key.ctrl_r, keyboard.Key.ctrl],
-            '<control>': [keyboard.Key.ctrl_l, keyboard.Key.ctrl_r, keyboard.Key.ctrl],
-            '<alt>': [keyboard.Key.alt_l, keyboard.Key.alt_r, keyboard.Key.alt, keyboard.Key.alt_gr],
-            '<shift>': [keyboard.Key.shift, keyboard.Key.shift_l, keyboard.Key.shift_r],
-            '<cmd>': [keyboard.Key.cmd, keyboard.Key.cmd_l, keyboard.Key.cmd_r],
-            '<win>': [keyboard.Key.cmd, keyboard.Key.cmd_l, keyboard.Key.cmd_r],
-        }
-        
-        for part in parts:
-            if part in key_mapping:
-                # For modifiers, we'll check if ANY variant is pressed
-                # Store as tuple to mark it as "any of these"
-                keys.add(('modifier', tuple(key_mapping[part])))
-            else:
-                # Regular key
-                part_clean = part.strip('<>')
-                if len(part_clean) == 1:
-                    # Create KeyCode for the character
-                    keys.add(keyboard.KeyCode.from_char(part_clean))
-                else:
-                    # Function keys, etc
-                    try:
-                        keys.add(getattr(keyboard.Key, part_clean))
-                    except AttributeError:
-                        log_error(f"Unknown key: {part_clean}", None)
-        
-        return keys
+        return _parse_hotkey_cached(hotkey_str)
     
     def check_hotkey_match(self, expected_keys, active_keys):
         """
@@ -162,47 +262,71 @@ class HotkeyManager:
         
         return False
     
+    def _normalize_key(self, key, source):
+        """Normalize key: char → lowercase KeyCode, VK A-Z/0-9 (Windows) → KeyCode char"""
+        try:
+            char = getattr(key, 'char', None)
+            if char:
+                return _char_keycode(char)
+            # If it's a KeyCode without char but with vk (Windows), normalize to char
+            vk = getattr(key, 'vk', None)
+            if vk is not None and isinstance(key, keyboard.KeyCode):
+                return _VK_KEYCODES.get(vk, key)
+            return key
+        except Exception as e:
+            log_error(f"Error normalizing key in {source}", e)
+            return key
+    
     def on_press(self, key):
         """Callback khi nhấn phím"""
+        # Check running đầu tiên, ngoài lock - trạng thái đã stop không bao giờ đụng tới lock
+        # (đọc attribute bool là atomic dưới GIL)
         if not self.running:
             return
         
+        normalized_key = self._normalize_key(key, 'on_press')
+        # Auto-repeat khi giữ phím: phím đã nằm trong active_keys → không có gì mới để match.
+        # Chỉ bỏ qua khi press trước đó còn gần - release bị mất (đổi focus, UAC prompt...)
+        # để phím kẹt trong active_keys thì lần nhấn sau vẫn được xử lý bình thường
+        now = time.monotonic()
+        last_press = self._last_press.get(normalized_key)
+        self._last_press[normalized_key] = now
+        if (last_press is not None and now - last_press < self.REPEAT_WINDOW_S
+                and normalized_key in self.active_keys):
+            return
+        if normalized_key in self.active_keys:
+            # Phím kẹt từ release bị mất → reset như khi thả phím để hotkey trigger lại được
+            self._triggered_mask = 0
+        
+        # Snapshot config - đọc 1 lần, không cần lock (set_hotkeys chỉ thay cả object)
+        cfg = self._config
+        
         with self._lock:
-            # Normalize key
-            try:
-                if hasattr(key, 'char') and key.char:
-                    normalized_key = keyboard.KeyCode.from_char(key.char.lower())
-                else:
-                    # If it's a KeyCode without char but with vk (Windows), normalize to char
-                    if isinstance(key, keyboard.KeyCode) and hasattr(key, 'vk') and key.vk is not None:
-                        vk = key.vk
-                        try:
-                            if 65 <= vk <= 90:  # A-Z
-                                normalized_key = keyboard.KeyCode.from_char(chr(vk).lower())
-                            elif 48 <= vk <= 57:  # 0-9
-                                normalized_key = keyboard.KeyCode.from_char(chr(vk))
-                            else:
-                                normalized_key = key
-                        except Exception as e:
-                            log_error("Error normalizing VK code in on_press", e)
-                            normalized_key = key
-                    else:
-                        normalized_key = key
-            except Exception as e:
-                log_error("Error normalizing key in on_press", e)
-                normalized_key = key
-            
+            # stop() có thể chạy xen giữa check ở trên và lúc lấy lock → không trigger nữa
+            if not self.running:
+                return
             self.active_keys.add(normalized_key)
             
             # Only attempt matching when a NON-modifier key was pressed (edge trigger on main key)
-            if not self._is_modifier(normalized_key):
-                for action, hotkey_str in self.hotkeys.items():
-                    expected_keys = self.parse_hotkey(hotkey_str)
-                    
+            if self._is_modifier(normalized_key):
+                self._active_mod_mask |= _KEY_MOD_BITS.get(normalized_key, 0)
+            else:
+                active_mask = self._active_mod_mask
+                candidates = cfg.trigger_index.get(normalized_key, ())
+                if cfg.modifier_only:
+                    candidates = (*candidates, *cfg.modifier_only)
+                for action, action_bit, mask, others in candidates:
                     # Check if all expected keys are pressed and not already triggered
-                    if self.check_hotkey_match(expected_keys, self.active_keys) and action not in self.triggered_hotkeys:
+                    if ((active_mask & mask) == mask and others <= self.active_keys
+                            and not self._triggered_mask & action_bit):
+                        # Throttle: modifier thả rồi nhấn lại nhanh vẫn không trigger liên tục
+                        now = time.monotonic()
+                        if now - self._last_fired.get(action, 0.0) < self.MIN_INTERVAL_S:
+                            continue
+                        self._last_fired[action] = now
+                        
                         # Mark as triggered to prevent spam
-                        self.triggered_hotkeys.add(action)
+                        self._triggered_mask |= action_bit
                         
                         # Minimal log for trigger
                         log_debug(f"[Hotkeys] Triggered: {action}")
@@ -224,36 +348,19 @@ class HotkeyManager:
         if not self.running:
             return
         
-        with self._lock:
-            # Normalize key
-            try:
-                if hasattr(key, 'char') and key.char:
-                    normalized_key = keyboard.KeyCode.from_char(key.char.lower())
-                else:
-                    # If it's a KeyCode without char but with vk (Windows), normalize to char
-                    if isinstance(key, keyboard.KeyCode) and hasattr(key, 'vk') and key.vk is not None:
-                        vk = key.vk
-                        try:
-                            if 65 <= vk <= 90:  # A-Z
-                                normalized_key = keyboard.KeyCode.from_char(chr(vk).lower())
-                            elif 48 <= vk <= 57:  # 0-9
-                                normalized_key = keyboard.KeyCode.from_char(chr(vk))
-                            else:
-                                normalized_key = key
-                        except Exception as e:
-                            log_error("Error normalizing VK code in on_release", e)
-                            normalized_key = key
-                    else:
-                        normalized_key = key
-            except Exception as e:
-                log_error("Error normalizing key in on_release", e)
-                normalized_key = key
-            
-            # Remove from active keys
-            self.active_keys.discard(normalized_key)
-            
-            # Reset triggered hotkeys when any key is released
-            self.triggered_hotkeys.clear()
+        normalized_key = self._normalize_key(key, 'on_release')
+        
+        # Không cần lock: pynput gọi on_press/on_release tuần tự trên cùng 1 listener thread,
+        # set.discard và phép gán int là atomic dưới GIL
+        # Remove from active keys
+        self.active_keys.discard(normalized_key)
+        self._last_press.pop(normalized_key, None)
+        if self._is_modifier(normalized_key):
+            # Tính lại từ active_keys - có thể vẫn giữ biến thể còn lại (Ctrl trái + phải)
+            self._update_mod_mask()
+        
+        # Reset triggered hotkeys when any key is released
+        self._triggered_mask = 0
     
     def start(self):
         """Bắt đầu lắng nghe hotkeys"""
@@ -273,6 +380,7 @@ class HotkeyManager:
         if not self.running:
             return
         
+        # Tắt cờ trước khi stop listener để callback đang chạy dở thoát ngay
         self.running = False
         if self.listener:
             self.listener.stop()
@@ -280,6 +388,8 @@ class HotkeyManager:
         
         with self._lock:
             self.active_keys.clear()
+            self._active_mod_mask = 0
+            self._last_press.clear()
         
         log_debug("[Hotkeys] Stopped listening")
     
@@ -314,6 +424,7 @@ class HotkeyManager:
             return False, f"Lỗi parse hotkey: {str(e)}"
     
     @staticmethod
+    @lru_cache(maxsize=64)
     def format_hotkey_display(hotkey_str):
         """
         Format hotkey string để hiển thị cho người dùng
@@ -13,6 +13,112 @@ except ImportError:
     def log_debug(msg):
         pass
 
+# Numba (optional) - JIT kernel cho SWT ray casting, fallback về bản NumPy vectorized
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+
+def _swt_rays_numpy(edges, gradient_dir, swt_map, min_sw, max_sw, dark_on_light):
+    """Ray casting từ tất cả edge pixels cùng lúc (vectorized theo step), ghi min vào swt_map"""
+    h, w = edges.shape
+    ys, xs = np.nonzero(edges)
+    ray_dirs = gradient_dir[ys, xs]
+    if not dark_on_light:
+        ray_dirs = ray_dirs + np.pi
+    dxs = np.cos(ray_dirs)
+    dys = np.sin(ray_dirs)
+    
+    # widths[i] = stroke width của ray i (0 = không tìm được stroke hợp lệ)
+    widths = np.zeros(len(xs), dtype=np.intp)
+    active = np.arange(len(xs))
+    
+    for step in range(1, max_sw):
+        if active.size == 0:
+            break
+        
+        rx = np.round(xs[active] + dxs[active] * step).astype(np.intp)
+        ry = np.round(ys[active] + dys[active] * step).astype(np.intp)
+        
+        # Out of bounds → ray dừng
+        in_bounds = (rx >= 0) & (rx < w) & (ry >= 0) & (ry < h)
+        active, rx, ry = active[in_bounds], rx[in_bounds], ry[in_bounds]
+        
+        # Tìm edge pixel đối diện
+        hit = edges[ry, rx] > 0
+        if hit.any():
+            hit_idx = active[hit]
+            # Check gradient direction tương tự (opposite)
+            angle_diff = np.abs(gradient_dir[ry[hit], rx[hit]] - ray_dirs[hit_idx]) % (2 * np.pi)
+            # Normalize angle diff về [0, π]
+            angle_diff = np.where(angle_diff > np.pi, 2 * np.pi - angle_diff, angle_diff)
+            
+            # Nếu gradient ngược chiều (text stroke) - stroke width = số pixel trên ray
+            stroke_width = step + 1
+            if min_sw <= stroke_width <= max_sw:
+                widths[hit_idx[angle_diff > np.pi / 2]] = stroke_width
+            
+            # Ray dừng khi gặp edge bất kể hướng gradient
+            active = active[~hit]
+    
+    # Cập nhật SWT cho tất cả pixels trên các ray hợp lệ (min theo từng pixel)
+    valid = np.nonzero(widths)[0]
+    if valid.size:
+        for step in range(int(widths[valid].max())):
+            on_ray = valid[widths[valid] > step]
+            px = np.round(xs[on_ray] + dxs[on_ray] * step).astype(np.intp)
+            py = np.round(ys[on_ray] + dys[on_ray] * step).astype(np.intp)
+            np.minimum.at(swt_map, (py, px), widths[on_ray])
+
+
+_swt_rays = _swt_rays_numpy
+
+if NUMBA_AVAILABLE:
+    try:
+        @njit(cache=True, nogil=True, fastmath=True, boundscheck=False)
+        def _swt_rays_jit(edges, gradient_dir, swt_map, min_sw, max_sw, dark_on_light):
+            """Scalar ray casting từng edge pixel - early exit theo từng ray, buffer ray cấp phát 1 lần"""
+            h, w = edges.shape
+            ray_ys = np.empty(max_sw, dtype=np.int32)
+            ray_xs = np.empty(max_sw, dtype=np.int32)
+            for y in range(h):
+                for x in range(w):
+                    if edges[y, x] == 0:
+                        continue
+                    ray_dir = gradient_dir[y, x]
+                    if not dark_on_light:
+                        ray_dir += np.pi
+                    dx = np.cos(ray_dir)
+                    dy = np.sin(ray_dir)
+                    
+                    ray_ys[0] = y
+                    ray_xs[0] = x
+                    n = 1
+                    for step in range(1, max_sw):
+                        rx = int(np.round(x + dx * step))
+                        ry = int(np.round(y + dy * step))
+                        if rx < 0 or rx >= w or ry < 0 or ry >= h:
+                            break
+                        ray_ys[n] = ry
+                        ray_xs[n] = rx
+                        n += 1
+                        if edges[ry, rx] > 0:
+                            angle_diff = abs(gradient_dir[ry, rx] - ray_dir) % (2 * np.pi)
+                            if angle_diff > np.pi:
+                                angle_diff = 2 * np.pi - angle_diff
+                            if angle_diff > np.pi / 2 and min_sw <= n <= max_sw:
+                                for i in range(n):
+                                    if n < swt_map[ray_ys[i], ray_xs[i]]:
+                                        swt_map[ray_ys[i], ray_xs[i]] = n
+                            break
+        
+        _swt_rays = _swt_rays_jit
+    except Exception:
+        # cache=True có thể lỗi khi không ghi được cache dir (vd. bản build exe)
+        _swt_rays = _swt_rays_numpy
+
 
 class StrokeWidthTransform:
     """
@@ -23,6 +129,21 @@ class StrokeWidthTransform:
     def __init__(self):
         self.min_stroke_width = 2
         self.max_stroke_width = 50
+        # Buffer float32 dùng lại giữa các frame cùng kích thước (tạo lại khi kích thước đổi)
+        self._buf_shape = None
+        self._sobelx_buf = None
+        self._sobely_buf = None
+        self._grad_dir_buf = None
+        self._swt_buf = None
+    
+    def _ensure_buffers(self, shape):
+        """Cấp phát buffer 1 lần cho mỗi kích thước ảnh"""
+        if self._buf_shape != shape:
+            self._sobelx_buf = np.empty(shape, dtype=np.float32)
+            self._sobely_buf = np.empty(shape, dtype=np.float32)
+            self._grad_dir_buf = np.empty(shape, dtype=np.float32)
+            self._swt_buf = np.empty(shape, dtype=np.float32)
+            self._buf_shape = shape
     
     def apply(self, img: np.ndarray, dark_on_light: bool = False) -> np.ndarray:
         """
@@ -33,7 +154,7 @@ class StrokeWidthTransform:
             dark_on_light: True nếu text tối trên nền sáng (uncommon trong games)
         
         Returns:
-            SWT map (lower values = likely text regions)
+            SWT map (lower values = likely text regions) - buffer nội bộ, bị ghi đè ở lần gọi sau
         """
         try:
             if len(img.shape) == 3:
@@ -42,72 +163,23 @@ class StrokeWidthTransform:
             # Edge detection với Canny
             edges = cv2.Canny(img, 50, 150)
             
-            # Gradient direction (dùng Sobel)
-            sobelx = cv2.Sobel(img, cv2.CV_64F, 1, 0, ksize=3)
-            sobely = cv2.Sobel(img, cv2.CV_64F, 0, 1, ksize=3)
+            self._ensure_buffers(img.shape)
             
-            # Gradient magnitude và direction
-            gradient_mag = np.sqrt(sobelx**2 + sobely**2)
-            gradient_dir = np.arctan2(sobely, sobelx)
+            # Gradient direction (dùng Sobel) - float32 đủ chính xác cho ảnh 8-bit
+            sobelx = cv2.Sobel(img, cv2.CV_32F, 1, 0, dst=self._sobelx_buf, ksize=3)
+            sobely = cv2.Sobel(img, cv2.CV_32F, 0, 1, dst=self._sobely_buf, ksize=3)
+            gradient_dir = cv2.phase(sobelx, sobely, angle=self._grad_dir_buf, angleInDegrees=False)  # [0, 2π)
             
-            # Initialize SWT map với giá trị lớn
-            h, w = img.shape
-            swt_map = np.full((h, w), np.inf, dtype=np.float64)
+            # Initialize SWT map với max value (thay cho inf rồi replace sau):
+            # stroke width hợp lệ luôn <= max_stroke_width nên min() cho kết quả như cũ
+            swt_map = self._swt_buf
+            swt_map.fill(self.max_stroke_width * 2)
             
-            # Ray casting từ mỗi edge pixel
-            edge_pixels = np.argwhere(edges > 0)
+            # Ray casting (Numba kernel nếu có, không thì NumPy vectorized)
+            _swt_rays(edges, gradient_dir, swt_map,
+                      self.min_stroke_width, self.max_stroke_width, dark_on_light)
             
-            for y, x in edge_pixels:
-                # Ray direction dựa trên gradient
-                if dark_on_light:
-                    ray_dir = gradient_dir[y, x]
-                else:
-                    ray_dir = gradient_dir[y, x] + np.pi
-                
-                dx = np.cos(ray_dir)
-                dy = np.sin(ray_dir)
-                
-                # Ray casting
-                ray_x, ray_y = x, y
-                ray_pixels = [(y, x)]
-                
-                for step in range(1, self.max_stroke_width):
-                    ray_x += dx
-                    ray_y += dy
-                    
-                    rx = int(round(ray_x))
-                    ry = int(round(ray_y))
-                    
-                    # Out of bounds
-                    if rx < 0 or rx >= w or ry < 0 or ry >= h:
-                        break
-                    
-                    ray_pixels.append((ry, rx))
-                    
-                    # Tìm edge pixel đối diện
-                    if edges[ry, rx] > 0:
-                        # Check gradient direction tương tự (opposite)
-                        opposite_dir = gradient_dir[ry, rx]
-                        angle_diff = abs(opposite_dir - ray_dir)
-                        
-                        # Normalize angle diff
-                        if angle_diff > np.pi:
-                            angle_diff = 2 * np.pi - angle_diff
-                        
-                        # Nếu gradient ngược chiều (text stroke)
-                        if angle_diff > np.pi / 2:
-                            stroke_width = len(ray_pixels)
-                            
-                            if self.min_stroke_width <= stroke_width <= self.max_stroke_width:
-                                # Cập nhật SWT cho tất cả pixels trên ray
-                                for py, px in ray_pixels:
-                                    swt_map[py, px] = min(swt_map[py, px], stroke_width)
-                        break
-            
-            # Replace inf với max value
-            swt_map[swt_map == np.inf] = self.max_stroke_width * 2
-            
-            return swt_map.astype(np.float32)
+            return swt_map
             
         except Exception as e:
             log_error("Error in SWT apply", e)
@@ -126,13 +198,19 @@ class StrokeWidthTransform:
             Binary mask (255 = text, 0 = background)
         """
         try:
-            # Tính threshold dựa trên percentile
-            valid_values = swt_map[swt_map < self.max_stroke_width * 2]
+            # Tính threshold dựa trên percentile - stroke width là số nguyên <= max_stroke_width
+            # nên dùng histogram + cumsum thay cho np.percentile (sort toàn bộ), O(N)
+            no_stroke = self.max_stroke_width * 2
+            counts = np.bincount(swt_map.ravel().astype(np.intp), minlength=no_stroke + 1)[:no_stroke]
+            cum = counts.cumsum()
             
-            if len(valid_values) == 0:
+            if cum[-1] == 0:
                 return np.zeros_like(swt_map, dtype=np.uint8)
             
-            threshold = np.percentile(valid_values, threshold_percentile)
+            # Mask dùng `<=` trên giá trị nguyên nên percentile nội suy tương đương
+            # order statistic thứ floor(q * (n - 1)) - giá trị nhỏ nhất có cum vượt qua index đó
+            k = int(threshold_percentile / 100 * (cum[-1] - 1))
+            threshold = np.searchsorted(cum, k, side='right')
             
             # Create mask
             mask = np.zeros_like(swt_map, dtype=np.uint8)
@@ -164,6 +242,12 @@ class ColorTextExtractor:
             'cyan': [(85, 100, 100), (95, 255, 255)],    # Cyan text
             'light_gray': [(0, 0, 150), (180, 40, 220)], # Light gray text
         }
+        # Bound dạng np.uint8 tạo sẵn 1 lần - không dựng lại array mỗi frame
+        self._color_ranges_np = {
+            name: (np.array(lower, dtype=np.uint8), np.array(upper, dtype=np.uint8))
+            for name, (lower, upper) in self.color_ranges.items()
+        }
+        self._morph_kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
     
     def extract_by_color(self, img: np.ndarray, colors: Optional[List[str]] = None) -> Tuple[np.ndarray, np.ndarray]:
         """
@@ -183,22 +267,28 @@ class ColorTextExtractor:
             # Convert sang HSV
             hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
             
-            # Combine masks từ các màu
-            combined_mask = np.zeros(img.shape[:2], dtype=np.uint8)
+            # Combine masks từ các màu - OR in-place vào 1 buffer, inRange ghi vào buffer tạm dùng lại
+            combined_mask = None
+            mask = None
             
             colors_to_use = colors if colors else list(self.color_ranges.keys())
             
             for color_name in colors_to_use:
-                if color_name not in self.color_ranges:
+                if color_name not in self._color_ranges_np:
                     continue
                 
-                lower, upper = self.color_ranges[color_name]
-                mask = cv2.inRange(hsv, np.array(lower), np.array(upper))
-                combined_mask = cv2.bitwise_or(combined_mask, mask)
+                lower, upper = self._color_ranges_np[color_name]
+                if combined_mask is None:
+                    combined_mask = cv2.inRange(hsv, lower, upper)
+                else:
+                    mask = cv2.inRange(hsv, lower, upper, dst=mask)
+                    cv2.bitwise_or(combined_mask, mask, dst=combined_mask)
+            
+            if combined_mask is None:
+                combined_mask = np.zeros(img.shape[:2], dtype=np.uint8)
             
             # Morphology để clean mask
-            kernel = cv2.getStructuringElement(cv2.MORPH_ELLIPSE, (3, 3))
-            combined_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_CLOSE, kernel, iterations=1)
+            combined_mask = cv2.morphologyEx(combined_mask, cv2.MORPH_CLOSE, self._morph_kernel, iterations=1)
             
             # Apply mask lên ảnh gốc
             result = cv2.bitwise_and(img, img, mask=combined_mask)
@@ -227,9 +317,11 @@ class ColorTextExtractor:
             best_mask = None
             best_coverage = 0
             
-            for color_name, (lower, upper) in self.color_ranges.items():
-                hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-                mask = cv2.inRange(hsv, np.array(lower), np.array(upper))
+            # Convert sang HSV 1 lần cho tất cả màu
+            hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
+            
+            for color_name, (lower, upper) in self._color_ranges_np.items():
+                mask = cv2.inRange(hsv, lower, upper)
                 
                 coverage = np.count_nonzero(mask) / mask.size
                 
@@ -258,6 +350,21 @@ class BackgroundNoiseDetector:
     
     def __init__(self):
         self.noise_threshold = 45.0  # Threshold cho high freq noise
+        self._mask_shape = None
+        self._high_freq_mask = None
+    
+    def _get_high_freq_mask(self, h: int, w: int) -> np.ndarray:
+        """Mask vùng high freq cho spectrum chưa shift - chỉ tạo lại khi kích thước ảnh đổi"""
+        if self._mask_shape != (h, w):
+            # Create mask để exclude center (low freq - main content)
+            center_mask = np.zeros((h, w), np.uint8)
+            center_radius = min(h, w) // 6  # Center 1/6 là low freq
+            cv2.circle(center_mask, (w//2, h//2), center_radius, 1, -1)
+            
+            # High freq region (outside center), dời về toạ độ DFT gốc thay vì fftshift spectrum
+            self._high_freq_mask = np.ascontiguousarray(np.fft.ifftshift(1 - center_mask))
+            self._mask_shape = (h, w)
+        return self._high_freq_mask
     
     def detect_noise_level(self, img: np.ndarray) -> float:
         """
@@ -273,25 +380,16 @@ class BackgroundNoiseDetector:
             if len(img.shape) == 3:
                 img = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
             
-            # Fourier transform
-            f = np.fft.fft2(img)
-            fshift = np.fft.fftshift(f)
+            # Fourier transform (OpenCV DFT float32 - nhanh hơn np.fft.fft2 complex128)
+            f = cv2.dft(np.float32(img), flags=cv2.DFT_COMPLEX_OUTPUT)
+            magnitude = cv2.magnitude(*cv2.split(f))
             
-            # Magnitude spectrum (log scale)
-            magnitude = 20 * np.log(np.abs(fshift) + 1)
+            # Magnitude spectrum (log scale) - tính in-place
+            cv2.log(magnitude + 1, magnitude)
             
+            # Tính noise score từ high freq magnitude (mask cache theo kích thước ảnh)
             h, w = img.shape
-            
-            # Create mask để exclude center (low freq - main content)
-            center_mask = np.zeros((h, w), np.uint8)
-            center_radius = min(h, w) // 6  # Center 1/6 là low freq
-            cv2.circle(center_mask, (w//2, h//2), center_radius, 1, -1)
-            
-            # High freq region (outside center)
-            high_freq_mask = 1 - center_mask
-            
-            # Tính noise score từ high freq magnitude
-            noise_score = magnitude[high_freq_mask == 1].mean()
+            noise_score = 20 * cv2.mean(magnitude, mask=self._get_high_freq_mask(h, w))[0]
             
             # Normalize về 0-100
             noise_score = min(100, max(0, (noise_score - 30) * 2))
@@ -376,16 +474,16 @@ class AdvancedImageProcessor:
                 'color_coverage': 0.0,
                 'swt_applied': False,
                 'aggressive_denoise': False,
-                'fast_path': False
+                'fast_path': False,
+                'noise_skipped': False
             }
             
-            # Convert sang BGR nếu cần
-            if len(img.shape) == 2:
-                img_bgr = cv2.cvtColor(img, cv2.COLOR_GRAY2BGR)
-                gray = img.copy()
+            # Các bước phía dưới không sửa ảnh in-place → không cần copy
+            is_color = len(img.shape) == 3
+            if is_color:
+                gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
             else:
-                img_bgr = img.copy()
-                gray = cv2.cvtColor(img_bgr, cv2.COLOR_BGR2GRAY)
+                gray = img
             
             # FAST PATH: Ảnh chất lượng cao (contrast tốt, ít noise) → skip processing
             if mode == 'auto' or mode == 'fast':
@@ -400,30 +498,41 @@ class AdvancedImageProcessor:
                     result = clahe.apply(gray)
                     return result, info
             
-            # Step 1: Color-based extraction (nếu có màu)
-            color_extracted, color_mask = self.color_extractor.extract_dominant_text_color(img_bgr)
-            color_coverage = np.count_nonzero(color_mask) / color_mask.size
-            info['color_coverage'] = color_coverage
-            
-            # Chọn ảnh tốt hơn (color extracted vs original)
-            if color_coverage > 0.05:  # Có ít nhất 5% text pixels
-                working_img = color_extracted
-            else:
-                working_img = img_bgr
+            # Vùng chứa text (x, y, w, h) khi dùng color mask - ngoài vùng này ảnh đã là 0
+            text_roi = None
             
-            # Convert sang grayscale
-            if len(working_img.shape) == 3:
-                gray = cv2.cvtColor(working_img, cv2.COLOR_BGR2GRAY)
+            # Step 1: Color-based extraction (chỉ với ảnh màu - ảnh grayscale không có màu HSV để tách)
+            if is_color:
+                color_extracted, color_mask = self.color_extractor.extract_dominant_text_color(img)
+                color_coverage = np.count_nonzero(color_mask) / color_mask.size
+                info['color_coverage'] = color_coverage
+                
+                # Chọn ảnh tốt hơn (color extracted vs original) - original thì gray đã có sẵn
+                if color_coverage > 0.05:  # Có ít nhất 5% text pixels
+                    gray = cv2.cvtColor(color_extracted, cv2.COLOR_BGR2GRAY)
+                    text_roi = cv2.boundingRect(color_mask)
+            
+            # Step 2: Noise detection - bỏ qua khi color mask đã rõ (denoise không giúp OCR thêm)
+            if info['color_coverage'] > 0.30:
+                noise_level = 0.0
+                info['noise_skipped'] = True
             else:
-                gray = working_img
-            
-            # Step 2: Noise detection
-            noise_level = self.noise_detector.detect_noise_level(gray)
+                noise_level = self.noise_detector.detect_noise_level(gray)
             info['noise_level'] = noise_level
             
             # Step 3: Adaptive denoising nếu cần
             if noise_level > 40:
-                gray = self.noise_detector.adaptive_denoise(gray, noise_level)
+                if text_roi is not None:
+                    # Chỉ denoise vùng text (pad 8px) rồi đặt lại vào ảnh 0 cùng kích thước
+                    x, y, w, h = text_roi
+                    x0, y0 = max(0, x - 8), max(0, y - 8)
+                    x1, y1 = min(gray.shape[1], x + w + 8), min(gray.shape[0], y + h + 8)
+                    denoised = np.zeros_like(gray)
+                    denoised[y0:y1, x0:x1] = self.noise_detector.adaptive_denoise(
+                        np.ascontiguousarray(gray[y0:y1, x0:x1]), noise_level)
+                    gray = denoised
+                else:
+                    gray = self.noise_detector.adaptive_denoise(gray, noise_level)
                 info['aggressive_denoise'] = True
             
             # Step 4: SWT-based enhancement (optional, chỉ khi mode aggressive)
@@ -5,12 +5,27 @@ Combines best practices from both codebases with robust error handling
 import time
 import os
 import sys
+import queue
+import atexit
+import threading
 import traceback
 from datetime import datetime
 
 # Global flag to control debug logging
 _debug_logging_enabled = True
 
+# Debug log ghi qua queue + writer thread: caller chỉ put, thread giữ file mở và ghi theo batch
+_log_queue = queue.Queue()
+_log_thread = None
+_log_thread_lock = threading.Lock()
+_LOG_FLUSH_INTERVAL = 0.1  # Giây - thời gian chờ tối đa trước khi flush batch
+_LOG_STOP = object()  # Sentinel báo writer thread dừng
+
+# Đường dẫn log tính 1 lần (get_base_dir + makedirs), không lặp lại mỗi message
+_cached_debug_log_path = None
+_cached_error_log_path = None
+_log_paths_lock = threading.Lock()
+
 def get_base_dir():
     """Lấy thư mục gốc - hỗ trợ cả script và exe"""
     try:
@@ -33,22 +48,29 @@ def get_base_dir():
                 return "."
 
 def set_debug_logging_enabled(enabled):
-    """Enable or disable debug logging."""
-    global _debug_logging_enabled
+    """Enable or disable debug logging.
+    
+    Rebind luôn tên log_debug của module: khi tắt, ai gọi qua `logger.log_debug` chỉ tốn 1 lời gọi rỗng.
+    Module đã `from .logger import log_debug` vẫn giữ bản thật - bản thật tự check flag nên vẫn đúng.
+    """
+    global _debug_logging_enabled, log_debug
     _debug_logging_enabled = enabled
+    log_debug = _log_debug if enabled else _noop_log_debug
 
 def is_debug_logging_enabled():
     """Check if debug logging is currently enabled."""
     return _debug_logging_enabled
 
-def log_debug(message):
-    """Appends a timestamped message to the debug log file if logging is enabled."""
-    if not _debug_logging_enabled:
-        return
-    
-    try:
+def _resolve_log_paths():
+    """Tính đường dẫn debug/error log 1 lần (kèm makedirs) - fallback cwd rồi temp nếu không tạo được thư mục"""
+    global _cached_debug_log_path, _cached_error_log_path
+    with _log_paths_lock:
+        if _cached_error_log_path is not None:
+            return
+        
         base_dir = get_base_dir()
         debug_log_file = os.path.join(base_dir, 'translator_debug.log')
+        error_log_file = os.path.join(base_dir, "error_log.txt")
         
         # Đảm bảo thư mục tồn tại
         try:
@@ -58,25 +80,117 @@ def log_debug(message):
             try:
                 base_dir = os.getcwd()
                 debug_log_file = os.path.join(base_dir, 'translator_debug.log')
+                error_log_file = os.path.join(base_dir, "error_log.txt")
             except Exception:
                 # Ultimate fallback: thư mục temp
                 try:
                     import tempfile
                     base_dir = tempfile.gettempdir()
                     debug_log_file = os.path.join(base_dir, 'real-time-trans_debug.log')
+                    error_log_file = os.path.join(base_dir, "real-time-trans_error_log.txt")
                 except Exception:
                     pass  # Complete failure
         
+        _cached_debug_log_path = debug_log_file
+        _cached_error_log_path = error_log_file
+
+def _get_debug_log_path():
+    if _cached_debug_log_path is None:
+        _resolve_log_paths()
+    return _cached_debug_log_path
+
+def _get_error_log_path():
+    if _cached_error_log_path is None:
+        _resolve_log_paths()
+    return _cached_error_log_path
+
+def _write_debug_batch(f, lines):
+    """Ghi 1 batch, mở file nếu chưa mở. Trả về file handle (None nếu ghi thất bại)"""
+    try:
+        if f is None:
+            f = open(_get_debug_log_path(), 'a', encoding='utf-8', errors='replace')
+        f.write(''.join(lines))
+        f.flush()  # 1 lần flush cho cả batch
+        return f
+    except (IOError, PermissionError, OSError):
+        # Fallback to stderr if available
         try:
-            with open(debug_log_file, 'a', encoding='utf-8', errors='replace') as f:
-                f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')}: {message}\n")
-                f.flush()  # Force write to disk
-        except (IOError, PermissionError, OSError):
-            # Fallback to stderr if available
+            for line in lines:
+                sys.stderr.write(f"[DEBUG LOG FAILED] {line}")
+        except Exception:
+            pass  # Last resort: ignore
+        if f is not None:
             try:
-                sys.stderr.write(f"[DEBUG LOG FAILED] {message}\n")
+                f.close()
             except Exception:
-                pass  # Last resort: ignore
+                pass
+        return None  # Batch sau thử mở lại file
+
+def _debug_log_writer():
+    """Writer thread: chờ message, gom hết phần đang có trong queue rồi ghi 1 lần"""
+    f = None
+    stopping = False
+    last_second = None
+    last_stamp = ""
+    while not stopping:
+        try:
+            item = _log_queue.get(timeout=_LOG_FLUSH_INTERVAL)
+        except queue.Empty:
+            continue
+        lines = []
+        while True:
+            if item is _LOG_STOP:
+                stopping = True
+            else:
+                # Timestamp format ở writer thread; message cùng giây dùng lại chuỗi đã format
+                ts, message = item
+                second = int(ts)
+                if second != last_second:
+                    last_second = second
+                    last_stamp = datetime.fromtimestamp(second).isoformat(sep=' ', timespec='seconds')
+                lines.append(f"{last_stamp}: {message}\n")
+            try:
+                item = _log_queue.get_nowait()
+            except queue.Empty:
+                break
+        if lines:
+            f = _write_debug_batch(f, lines)
+    if f is not None:
+        try:
+            f.close()
+        except Exception:
+            pass
+
+def _ensure_log_thread():
+    """Start writer thread lần đầu log_debug được gọi"""
+    global _log_thread
+    with _log_thread_lock:
+        if _log_thread is None:
+            _log_thread = threading.Thread(target=_debug_log_writer, name="DebugLogWriter", daemon=True)
+            _log_thread.start()
+
+def _flush_and_close():
+    """Drain queue và đóng file khi thoát (atexit)"""
+    thread = _log_thread
+    if thread is not None and thread.is_alive():
+        _log_queue.put(_LOG_STOP)
+        thread.join(timeout=2.0)
+
+atexit.register(_flush_and_close)
+
+def _noop_log_debug(message):
+    """log_debug khi debug logging tắt"""
+    pass
+
+def _log_debug(message):
+    """Queues a timestamped message for the debug log file if logging is enabled."""
+    if not _debug_logging_enabled:
+        return
+    
+    try:
+        if _log_thread is None:
+            _ensure_log_thread()
+        _log_queue.put_nowait((time.time(), message))
     except Exception:
         # Ultimate fallback: try stderr
         try:
@@ -84,33 +198,17 @@ def log_debug(message):
         except Exception:
             pass  # Complete failure, ignore
 
+log_debug = _log_debug
+
 def log_error(error_msg, exception=None):
     """Ghi lỗi ra file error_log.txt để debug - robust error handling cho EXE"""
     try:
-        base_dir = get_base_dir()
-        error_log_file = os.path.join(base_dir, "error_log.txt")
-        
-        # Đảm bảo thư mục tồn tại
-        try:
-            os.makedirs(base_dir, exist_ok=True)
-        except (OSError, PermissionError) as dir_err:
-            # Nếu không tạo được thư mục, fallback về thư mục hiện tại
-            try:
-                base_dir = os.getcwd()
-                error_log_file = os.path.join(base_dir, "error_log.txt")
-            except Exception:
-                # Ultimate fallback: thư mục temp
-                try:
-                    import tempfile
-                    base_dir = tempfile.gettempdir()
-                    error_log_file = os.path.join(base_dir, "real-time-trans_error_log.txt")
-                except Exception:
-                    pass  # Complete failure
+        error_log_file = _get_error_log_path()
         
         # Ghi log với error handling
         try:
             with open(error_log_file, 'a', encoding='utf-8', errors='replace') as f:
-                timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+                timestamp = datetime.now().isoformat(sep=' ', timespec='seconds')
                 f.write(f"\n[{timestamp}] {error_msg}\n")
                 if exception:
                     f.write(f"Exception: {str(exception)}\n")
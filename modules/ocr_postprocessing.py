@@ -3,8 +3,7 @@ OCR Post-processing utilities - Nâng cao cho game graphics
 Improves OCR accuracy by fixing common OCR errors với game-specific fixes
 """
 import re
-import unicodedata
-from .logger import log_debug, log_error
+from .logger import log_error
 
 # Game-specific character substitutions (common OCR mistakes trong game text)
 GAME_OCR_FIXES = {
@@ -46,7 +45,172 @@ DIALOGUE_PATTERNS = {
     'hyphenated': re.compile(r'\b\w{2,}-\w{2,}\b', re.IGNORECASE),  # well-well, uh-huh
 }
 
-def post_process_ocr_text_general(text, lang='auto'):
+# GAME_OCR_FIXES gộp thành 1 regex alternation (dài trước) → 1 lần quét thay vì replace từng key.
+# 'O0'/'0O' giữ replace tuần tự vì kết quả của key này có thể tạo match cho key kia (O0O → 000)
+_GAME_OCR_CHAINED_FIXES = [(k, GAME_OCR_FIXES[k]) for k in ('O0', '0O')]
+_GAME_OCR_FIX_RE = re.compile('|'.join(
+    re.escape(k) for k in sorted(GAME_OCR_FIXES, key=len, reverse=True)
+    if k not in ('O0', '0O') and k != GAME_OCR_FIXES[k]
+))
+_GAME_OCR_FIX_GET = GAME_OCR_FIXES.__getitem__
+
+# Regex compile 1 lần ở module level - các hàm post-process chạy mỗi frame OCR
+# Từ kết thúc bằng I hoa (nhưng không phải "I" đơn lẻ)
+_TRAILING_I_RE = re.compile(r'\b[A-Za-z]{2,}I\b')
+_DOUBLE_I_RE = re.compile(r'\b([A-Za-z]+)II\b')
+
+# "l" đầu câu/mệnh đề → "I"
+_LEADING_L_RE = re.compile(r'^l\s')
+_PERIOD_L_RE = re.compile(r'\.\s+l\s')
+_EXCLAIM_L_RE = re.compile(r'!\s+l\s')
+_QUESTION_L_RE = re.compile(r'\?\s+l\s')
+_COMMA_L_RE = re.compile(r',\s+l\s')
+
+# Từ dính nhau (stuck words): Tookyou → Took you, areyou → are you
+_STUCK_WORD_FIXES = [
+    (re.compile(r'\b([Tt])ookyou\b'), r'\1ook you'),
+    (re.compile(r'\b([Aa])reyou\b'), r'\1re you'),
+    (re.compile(r'\b([Dd])idyou\b'), r'\1id you'),
+    (re.compile(r'\b([Ww])hatyou\b'), r'\1hat you'),
+    (re.compile(r'\b([Ii])tsthe\b'), r"It's the"),
+    (re.compile(r'\b([Ii])fI\b'), r'\1f I'),
+    (re.compile(r'\b([Ii])fyou\b'), r'\1f you'),
+    (re.compile(r'\bspacingout\b'), 'spacing out'),
+    (re.compile(r'\bthoughtthis\b'), 'thought this'),
+    (re.compile(r'\b([Ii])truined\b'), r'\1t ruined'),
+    (re.compile(r'\btoalI\b'), 'to all'),
+    (re.compile(r'\btoall\b'), 'to all'),
+]
+
+# Game words với l/I confusion: wilI -> will, alI -> all
+_WILL_RE = re.compile(r'\b([Ww])il([I|l])\b')
+_ALL_RE = re.compile(r'\bal([I|l])\b', re.IGNORECASE)
+_WILL_CI_RE = re.compile(r'\bwi([I|l])([I|l])\b', re.IGNORECASE)
+_I_LL_RE = re.compile(r'\bI([I|l])([I|l])\b')
+
+# English-specific OCR fixes (word boundary, không phân biệt hoa thường)
+_ENGLISH_OCR_FIXES = {
+    '{': '(', '}': ')', '\\/': 'V',
+    'vvhen': 'when', 'Vvhen': 'When',
+    'vvhat': 'what', 'Vvhat': 'What',
+    'vvith': 'with', 'Vvith': 'With',
+}
+# IGNORECASE → key viết thường đầu tiên thắng (vvhen/Vvhen đều thành 'when' như khi sub tuần tự)
+_ENGLISH_OCR_FIX_MAP = {}
+for _error, _correction in _ENGLISH_OCR_FIXES.items():
+    _ENGLISH_OCR_FIX_MAP.setdefault(_error.lower(), _correction)
+# 1 lần quét cho tất cả key. Khi sub tuần tự, '\/' → 'V' chạy trước và dính vào từ bên cạnh
+# (abc\/vvhen → abcVvvhen) làm mất word boundary của vvhen... → lookaround giữ đúng hành vi đó
+_ENGLISH_OCR_FIX_RE = re.compile(
+    r'\b(?:' + '|'.join(re.escape(k) for k in _ENGLISH_OCR_FIX_MAP if not k.isalnum()) + r')\b'
+    r'|(?<!\w\\/)\b(?:' + '|'.join(k for k in _ENGLISH_OCR_FIX_MAP if k.isalnum()) + r')\b(?!\\/\w)',
+    re.IGNORECASE)
+
+# Unicode punctuation → ASCII - translate table: 1 lần quét C-level thay cho replace từng ký tự
+_OCR_UNICODE_TRANS = str.maketrans({
+    '\u201E': '"',  # Double low-9 quotation mark
+    '\u2019': "'",  # Right single quotation mark
+    '\u2014': '-',  # Em dash
+    '\u2013': '-',  # En dash
+    '\u2026': '...',  # Horizontal ellipsis
+})
+
+# Spacing quanh dấu câu
+_HSPACE_RE = re.compile(r'[ \t]+')
+# Gộp 3 pass (thêm space sau .!? trước chữ hoa, xóa space trước dấu câu, thêm space sau dấu câu)
+# thành 1 lần quét. Nhánh 1: xóa space trước dấu câu - group 2 (rỗng) match khi ngay sau là chữ
+# và dấu không phải ~ → cần thêm space. Nhánh 2: dấu câu dính chữ.
+_PUNCT_SPACING_RE = re.compile(
+    r'\s+([,.!?;:~])((?<!~)(?=[A-Za-z]))?'
+    r'|([,.!?;:])(?=[A-Za-z])'
+)
+
+
+def _fix_punct_spacing(match):
+    punct = match.group(1)
+    if punct is None:
+        return match.group(3) + ' '
+    return punct + ' ' if match.group(2) is not None else punct
+
+# post_process_ocr_for_game_subtitle
+_SPEAKER_RE = re.compile(r'^([A-Za-z][A-Za-z\s\-\']{0,30}):\s*(.+)')
+# Brackets/parentheses spacing gộp 1 lần quét: xóa space sau [ ( và trước ] ), thêm space
+# giữa ] ) và chữ. Group 3 (rỗng) đánh dấu ] ) vừa bỏ space phía trước mà ngay sau là chữ
+_BRACKET_SPACING_RE = re.compile(
+    r'([\[(])\s+'
+    r'|\s+([\])])((?=[A-Za-z]))?'
+    r'|([\])])(?=[A-Za-z])'
+)
+# Asterisks giữ sub tuần tự: kết quả pass trước tạo match cho pass sau (* x → **x → ** x)
+_ASTERISK_AFTER_SPACE_RE = re.compile(r'\*+\s+')
+_ASTERISK_BEFORE_SPACE_RE = re.compile(r'\s+\*+')
+_ASTERISK_TEXT_RE = re.compile(r'\*\*([A-Za-z])')
+_LEADING_DASH_SPACE_RE = re.compile(r'^[-—–]\s+')
+_LEADING_DASH_TEXT_RE = re.compile(r'^[-—–]([A-Za-z])')
+_DOTS_RE = re.compile(r'\.{2,}')
+_LEADING_JUNK_RE = re.compile(r'^[\|\s\.,;:_=+]+')
+_TRAILING_JUNK_RE = re.compile(r'[\|\s\.,;:_=+]+$')
+_WS_RE = re.compile(r'\s+')
+
+_SUFFIXES_ENDING_WITH_L = tuple(SUFFIXES_ENDING_WITH_L)
+
+# Fast path cho post_process_ocr_text_general: text không match pattern nào của các bước sửa
+# → mọi bước đều giữ nguyên text, trả về luôn. Alternation gồm điều kiện cần của từng bước
+# (chính pattern đó, hoặc dạng lỏng hơn) - chỉ được phép match NHIỀU hơn, không được ít hơn
+_NEEDS_FIX_RE = re.compile('|'.join(
+    [
+        _GAME_OCR_FIX_RE.pattern, 'O0', '0O',
+        r'[A-Za-z]{2}I\b',  # _TRAILING_I_RE, _DOUBLE_I_RE
+        _LEADING_L_RE.pattern, _PERIOD_L_RE.pattern, _EXCLAIM_L_RE.pattern,
+        _QUESTION_L_RE.pattern, _COMMA_L_RE.pattern,
+    ]
+    + [pattern.pattern for pattern, _ in _STUCK_WORD_FIXES]
+    + [_WILL_RE.pattern, '(?i:' + _ALL_RE.pattern + ')', '(?i:' + _WILL_CI_RE.pattern + ')', _I_LL_RE.pattern]
+    + [r'\|\|', '(?i:' + _ENGLISH_OCR_FIX_RE.pattern + ')']
+    + ['[' + ''.join(map(chr, _OCR_UNICODE_TRANS)) + ']']
+    + [r'\t|  ',  # _HSPACE_RE - 1 space đơn thay bằng ' ' là không đổi
+       _PUNCT_SPACING_RE.pattern]
+))
+
+
+def _fix_bracket_spacing(match):
+    opening = match.group(1)
+    if opening is not None:
+        return opening
+    closing = match.group(2)
+    if closing is not None:
+        return closing + ' ' if match.group(3) is not None else closing
+    return match.group(4) + ' '
+
+
+def _fix_trailing_I(match):
+    """wordI → wordl nếu suffix sau khi sửa nằm trong SUFFIXES_ENDING_WITH_L"""
+    word = match.group(0)
+    # Thử chuyển I cuối thành l
+    fixed = word[:-1] + 'l'
+    if fixed.lower().endswith(_SUFFIXES_ENDING_WITH_L):
+        return fixed
+    return word  # Giữ nguyên nếu không match
+
+
+def _apply_french_fixes(text):
+    return text.replace('||', 'Il')
+
+
+def _apply_english_fixes(text):
+    """English-specific OCR fixes (nâng cao) - word boundary fixes"""
+    return _ENGLISH_OCR_FIX_RE.sub(lambda m: _ENGLISH_OCR_FIX_MAP[m.group(0).lower()], text)
+
+
+# Dispatch theo 2 ký tự đầu của lang: 'fra'/'fr' → 'fr', 'eng'/'en' → 'en'
+# (tương đương startswith('fra') or startswith('fr') - prefix 'fra' luôn bắt đầu bằng 'fr')
+_LANG_FIXES = {
+    'fr': _apply_french_fixes,
+    'en': _apply_english_fixes,
+}
+
+
+def post_process_ocr_text_general(text, lang='auto', _internal=False):
     """
     Post-process OCR text to fix common OCR errors
     Nâng cấp với game-specific character mapping
@@ -54,6 +218,7 @@ def post_process_ocr_text_general(text, lang='auto'):
     Args:
         text: Raw OCR text
         lang: Language code (e.g., 'eng', 'fra', 'jpn')
+        _internal: Gọi từ post_process_ocr_for_game_subtitle - text đã là str, đã strip
     
     Returns:
         Cleaned text
@@ -62,60 +227,42 @@ def post_process_ocr_text_general(text, lang='auto'):
         if not text:
             return text
         
-        # Ensure text is string
-        if not isinstance(text, str):
-            text = str(text) if text else ""
-            if not text:
-                return text
+        if _internal:
+            cleaned = text
+        else:
+            # Ensure text is string
+            if type(text) is not str:
+                text = str(text)
+                if not text:
+                    return text
+            
+            cleaned = text.strip()
         
-        cleaned = text.strip()
+        # Text đã sạch (phổ biến) → 1 lần quét thay cho cả chuỗi sub bên dưới
+        if not _NEEDS_FIX_RE.search(cleaned):
+            return cleaned
         
-        for error, correction in GAME_OCR_FIXES.items():
+        cleaned = _GAME_OCR_FIX_RE.sub(lambda m: _GAME_OCR_FIX_GET(m.group(0)), cleaned)
+        for error, correction in _GAME_OCR_CHAINED_FIXES:
             cleaned = cleaned.replace(error, correction)
         
         # === FIX "I" (hoa) cuối từ thành "l" (thường) ===
         # Pattern: wordI → wordl (celestiaI → celestial, materiaI → material)
-        def fix_trailing_I(match):
-            word = match.group(0)
-            # Thử chuyển I cuối thành l
-            fixed = word[:-1] + 'l'
-            # Check xem suffix có trong danh sách không
-            for suffix in SUFFIXES_ENDING_WITH_L:
-                if fixed.lower().endswith(suffix):
-                    return fixed
-            return word  # Giữ nguyên nếu không match
-        
-        # Fix từ kết thúc bằng I hoa (nhưng không phải "I" đơn lẻ)
-        cleaned = re.sub(r'\b[A-Za-z]{2,}I\b', fix_trailing_I, cleaned)
+        cleaned = _TRAILING_I_RE.sub(_fix_trailing_I, cleaned)
         
         # Fix double I thành ll (alII → all, wiII → will)
-        cleaned = re.sub(r'\b([A-Za-z]+)II\b', lambda m: m.group(1) + 'll', cleaned)
+        cleaned = _DOUBLE_I_RE.sub(lambda m: m.group(1) + 'll', cleaned)
         
         # === FIX "l" at sentence/clause start -> "I" ===
-        cleaned = re.sub(r'^l\s', 'I ', cleaned)
-        cleaned = re.sub(r'\.\s+l\s', '. I ', cleaned)
-        cleaned = re.sub(r'!\s+l\s', '! I ', cleaned)
-        cleaned = re.sub(r'\?\s+l\s', '? I ', cleaned)
-        cleaned = re.sub(r',\s+l\s', ', I ', cleaned)
+        cleaned = _LEADING_L_RE.sub('I ', cleaned)
+        cleaned = _PERIOD_L_RE.sub('. I ', cleaned)
+        cleaned = _EXCLAIM_L_RE.sub('! I ', cleaned)
+        cleaned = _QUESTION_L_RE.sub('? I ', cleaned)
+        cleaned = _COMMA_L_RE.sub(', I ', cleaned)
         
         # === FIX TỪ DÍNH NHAU (stuck words) ===
-        # Pattern: Tookyou → Took you, areyou → are you
-        stuck_word_fixes = [
-            (r'\b([Tt])ookyou\b', r'\1ook you'),
-            (r'\b([Aa])reyou\b', r'\1re you'),
-            (r'\b([Dd])idyou\b', r'\1id you'),
-            (r'\b([Ww])hatyou\b', r'\1hat you'),
-            (r'\b([Ii])tsthe\b', r"It's the"),
-            (r'\b([Ii])fI\b', r'\1f I'),
-            (r'\b([Ii])fyou\b', r'\1f you'),
-            (r'\bspacingout\b', 'spacing out'),
-            (r'\bthoughtthis\b', 'thought this'),
-            (r'\b([Ii])truined\b', r'\1t ruined'),
-            (r'\btoalI\b', 'to all'),
-            (r'\btoall\b', 'to all'),
-        ]
-        for pattern, replacement in stuck_word_fixes:
-            cleaned = re.sub(pattern, replacement, cleaned)
+        for pattern, replacement in _STUCK_WORD_FIXES:
+            cleaned = pattern.sub(replacement, cleaned)
         
         # KHÔNG dùng generic lowercase+uppercase pattern vì sẽ phá hỏng:
         # McDonald → Mc Donald, iPhone → i Phone, YouTube → You Tube
@@ -123,48 +270,25 @@ def post_process_ocr_text_general(text, lang='auto'):
         
         # Fix common game words với l/I confusion
         # wilI -> will, alI -> all, etc.
-        cleaned = re.sub(r'\b([Ww])il([I|l])\b', r'\1ill', cleaned)  # wilI -> will
-        cleaned = re.sub(r'\bal([I|l])\b', 'all', cleaned, flags=re.IGNORECASE)  # alI -> all
-        cleaned = re.sub(r'\bwi([I|l])([I|l])\b', 'will', cleaned, flags=re.IGNORECASE)  # wilI -> will
-        cleaned = re.sub(r'\bI([I|l])([I|l])\b', "I'll", cleaned)  # III → I'll
-        
-        ocr_errors = {
-            '\u201E': '"',  # Double low-9 quotation mark
-            '\u2019': "'",  # Right single quotation mark
-            '\u2014': '-',  # Em dash
-            '\u2013': '-',  # En dash
-            '\u2026': '...',  # Horizontal ellipsis
-        }
+        cleaned = _WILL_RE.sub(r'\1ill', cleaned)  # wilI -> will
+        cleaned = _ALL_RE.sub('all', cleaned)  # alI -> all
+        cleaned = _WILL_CI_RE.sub('will', cleaned)  # wilI -> will
+        cleaned = _I_LL_RE.sub("I'll", cleaned)  # III → I'll
         
         # Language-specific fixes
         if lang and isinstance(lang, str):
-            if lang.startswith('fra') or lang.startswith('fr'):
-                cleaned = cleaned.replace('||', 'Il')
-            
-            # English-specific OCR fixes (nâng cao)
-            if lang.startswith('eng') or lang.startswith('en'):
-                # Word boundary fixes
-                english_ocr_fixes = {
-                    '{': '(', '}': ')', '\\/': 'V',
-                    'vvhen': 'when', 'Vvhen': 'When',
-                    'vvhat': 'what', 'Vvhat': 'What',
-                    'vvith': 'with', 'Vvith': 'With',
-                }
-                for error, correction in english_ocr_fixes.items():
-                    cleaned = re.sub(r'\b' + re.escape(error) + r'\b', correction, cleaned, flags=re.IGNORECASE)
-        
-        for error, correction in ocr_errors.items():
-            cleaned = cleaned.replace(error, correction)
+            lang_fix = _LANG_FIXES.get(lang[:2])
+            if lang_fix is not None:
+                cleaned = lang_fix(cleaned)
         
-        # Fix broken sentences (missing space after punctuation)
-        cleaned = re.sub(r'([.!?])([A-Z])', r'\1 \2', cleaned)
+        cleaned = cleaned.translate(_OCR_UNICODE_TRANS)
         
-        cleaned = re.sub(r'[ \t]+', ' ', cleaned)
+        cleaned = _HSPACE_RE.sub(' ', cleaned)
         
         # Remove space before punctuation (including ~ as emotion marker)
-        cleaned = re.sub(r'\s+([,.!?;:~])', r'\1', cleaned)
-        # Add space after punctuation if missing (không thêm sau ~ vì là emotion marker)
-        cleaned = re.sub(r'([,.!?;:])([A-Za-z])', r'\1 \2', cleaned)
+        # + add space after punctuation if missing (không thêm sau ~ vì là emotion marker),
+        # bao gồm fix broken sentences (missing space sau .!? trước chữ hoa)
+        cleaned = _PUNCT_SPACING_RE.sub(_fix_punct_spacing, cleaned)
         
         return cleaned.strip()
     except Exception as e:
@@ -188,40 +312,28 @@ def remove_text_after_last_punctuation_mark(text):
             return text
         
         # Ensure text is string
-        if not isinstance(text, str):
-            text = str(text) if text else ""
+        if type(text) is not str:
+            text = str(text)
             if not text:
                 return text
         
-        pattern = r'[.!?]|\.{3}|…'
-        matches = list(re.finditer(pattern, text))
-        if not matches:
+        # Vị trí ngay sau dấu câu cuối cùng - rfind từ cuối, không duyệt match từ đầu chuỗi.
+        # Ellipsis (... hoặc …) tự đúng vì dấu chấm cuối của "..." chính là dấu câu cuối
+        end_pos = max(text.rfind('.'), text.rfind('!'), text.rfind('?'), text.rfind('…')) + 1
+        if end_pos == 0:
             return text
         
-        last_match = matches[-1]
-        end_pos = last_match.end()
-        
-        # Handle ellipsis specially (...)
-        if last_match.group() == ".":
-            if end_pos + 2 <= len(text) and text[end_pos:end_pos+2] == "..":
-                end_pos += 2
-        
         # Lấy phần text sau punctuation cuối
         remaining_text = text[end_pos:].strip()
         
-        # Nếu phần còn lại là fragment ngắn (< 15 chars) và không có punctuation
-        # → Coi như garbage (text mới đang xuất hiện)
+        # Nếu phần còn lại là fragment ngắn (< 15 chars) → Coi như garbage (text mới đang xuất hiện)
+        # (phần sau dấu câu cuối chắc chắn không còn .!? nên không cần check punctuation)
         if remaining_text:
-            # Check xem có punctuation trong remaining text không
-            has_punctuation = bool(re.search(r'[.!?]', remaining_text))
-            
-            # Nếu không có punctuation VÀ ngắn (< 15 chars hoặc < 3 words)
-            # → Xóa đi (coi như fragment)
-            if not has_punctuation:
-                word_count = len(remaining_text.split())
-                if len(remaining_text) < 15 or word_count < 3:
-                    # Fragment detected, remove it
-                    return text[:end_pos].strip()
+            # Nếu ngắn (< 15 chars hoặc < 3 words) → Xóa đi (coi như fragment)
+            word_count = len(remaining_text.split())
+            if len(remaining_text) < 15 or word_count < 3:
+                # Fragment detected, remove it
+                return text[:end_pos].strip()
         
         return text[:end_pos]
     except Exception as e:
@@ -245,17 +357,18 @@ def post_process_ocr_for_game_subtitle(text):
             return text
         
         # Ensure text is string
-        if not isinstance(text, str):
-            text = str(text) if text else ""
+        if type(text) is not str:
+            text = str(text)
             if not text:
                 return text
         
         cleaned = text.strip()
         
-        cleaned = post_process_ocr_text_general(cleaned, lang='eng')
+        # Đã ensure str + strip ở trên → general bỏ qua bước kiểm tra/strip đầu vào
+        cleaned = post_process_ocr_text_general(cleaned, lang='eng', _internal=True)
         
         # Detect pattern: NAME: dialogue
-        name_match = re.search(r'^([A-Za-z][A-Za-z\s\-\']{0,30}):\s*(.+)', cleaned)
+        name_match = _SPEAKER_RE.search(cleaned)
         if name_match:
             character_name = name_match.group(1).strip()
             dialogue = name_match.group(2).strip()
@@ -280,44 +393,38 @@ def post_process_ocr_for_game_subtitle(text):
         # [action], (sound), **emotion** → Chuẩn hóa spacing và format
         
         # Chuẩn hóa brackets/parentheses spacing: [text] → [text], ( text ) → (text)
-        cleaned = re.sub(r'\[\s+', '[', cleaned)  # Remove space after [
-        cleaned = re.sub(r'\s+\]', ']', cleaned)  # Remove space before ]
-        cleaned = re.sub(r'\(\s+', '(', cleaned)  # Remove space after (
-        cleaned = re.sub(r'\s+\)', ')', cleaned)  # Remove space before )
-        
-        # Chuẩn hóa asterisks: ** text ** → **text**
-        cleaned = re.sub(r'\*+\s+', '**', cleaned)  # **  text → **text
-        cleaned = re.sub(r'\s+\*+', '**', cleaned)  # text  ** → text**
+        # Remove space after [ (, before ] ), và ensure space sau ] ) nếu theo sau là text
+        # ([ text ] → [text], ( text ) → (text), ]Text → ] Text, )Text → ) Text)
+        cleaned = _BRACKET_SPACING_RE.sub(_fix_bracket_spacing, cleaned)
         
-        # Ensure space sau emotion markers nếu theo sau là text
-        cleaned = re.sub(r'\]([A-Za-z])', r'] \1', cleaned)  # ]Text → ] Text
-        cleaned = re.sub(r'\)([A-Za-z])', r') \1', cleaned)  # )Text → ) Text
-        cleaned = re.sub(r'\*\*([A-Za-z])', r'** \1', cleaned)  # **Text → ** Text
+        # Chuẩn hóa asterisks: ** text ** → **text** (đa số subtitle không có * → bỏ qua 3 pass)
+        if '*' in cleaned:
+            cleaned = _ASTERISK_AFTER_SPACE_RE.sub('**', cleaned)  # **  text → **text
+            cleaned = _ASTERISK_BEFORE_SPACE_RE.sub('**', cleaned)  # text  ** → text**
+            cleaned = _ASTERISK_TEXT_RE.sub(r'** \1', cleaned)  # **Text → ** Text
         
         # Normalize leading dash: "- Text", "— Text", "– Text" → "- Text" (ensure single space)
-        cleaned = re.sub(r'^[-—–]\s+', '- ', cleaned)  # Normalize all dash types at start
-        cleaned = re.sub(r'^[-—–]([A-Za-z])', r'- \1', cleaned)  # Add space if missing: "-Text" → "- Text"
+        cleaned = _LEADING_DASH_SPACE_RE.sub('- ', cleaned)  # Normalize all dash types at start
+        cleaned = _LEADING_DASH_TEXT_RE.sub(r'- \1', cleaned)  # Add space if missing: "-Text" → "- Text"
         
         # Normalize ellipsis (...) - giữ nguyên vị trí nhưng chuẩn hóa format
-        cleaned = re.sub(r'\.{2,}', '...', cleaned)  # 2+ dots → ...
-        cleaned = cleaned.replace('…', '...')  # Unicode ellipsis → ...
+        cleaned = _DOTS_RE.sub('...', cleaned)  # 2+ dots → ...
+        # (Unicode ellipsis … → ... đã được general đổi qua _OCR_UNICODE_TRANS)
         
         # Ensure space before ellipsis nếu dính chữ: "sorry..." → "sorry..."(OK), "sorry…" → "sorry..."
         # Nhưng không thêm space: "I'm so sorry..." vẫn giữ nguyên
         
-        # Ensure quotes are balanced
-        quote_count = cleaned.count('"')
-        if quote_count % 2 != 0:  # Odd number of quotes
-            # Try to fix by removing trailing quote if at end
-            if cleaned.endswith('"'):
-                cleaned = cleaned[:-1]
+        # Ensure quotes are balanced - chỉ sửa được khi quote lẻ nằm ở cuối, nên check
+        # ký tự cuối trước (O(1)) rồi mới đếm quote (O(n))
+        if cleaned.endswith('"') and cleaned.count('"') % 2 != 0:
+            cleaned = cleaned[:-1]
         
         # Clean up excessive leading/trailing whitespace và junk characters (chỉ loại pure junk, giữ emotion markers)
         # Chỉ xóa trailing junk characters KHÔNG phải là emotion markers hợp lệ
-        cleaned = re.sub(r'^[\|\s\.,;:_=+]+', '', cleaned)  # Leading pure junk (không bao gồm -, *, [, (, ")
-        cleaned = re.sub(r'[\|\s\.,;:_=+]+$', '', cleaned)  # Trailing pure junk
+        cleaned = _LEADING_JUNK_RE.sub('', cleaned)  # Leading pure junk (không bao gồm -, *, [, (, ")
+        cleaned = _TRAILING_JUNK_RE.sub('', cleaned)  # Trailing pure junk
         
-        cleaned = re.sub(r'\s+', ' ', cleaned)
+        cleaned = _WS_RE.sub(' ', cleaned)
         
         if ':' in cleaned:
             parts = cleaned.split(':', 1)
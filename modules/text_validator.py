@@ -41,7 +41,7 @@ class TextValidator:
         # Pattern cho emotion markers trong game dialogue
         # [action], (sound), **emotion**, *emphasis*
         self.emotion_marker_pattern = re.compile(
-            r'\[[^\]]+\]|\([^\)]+\)|\*+[^\*]+\*+',  # [text], (text), **text**, *text*
+            r'\[[^\]\n]{1,200}\]|\([^)\n]{1,200}\)|\*{1,4}[^*\n]{1,200}\*{1,4}',  # [text], (text), **text**, *text*
             re.IGNORECASE
         )
         
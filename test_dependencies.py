@@ -63,6 +63,12 @@ def test_imports():
     except ImportError:
         print("⚠ chardet not installed (optional)")
     
+    try:
+        import rapidfuzz
+        print("✓ rapidfuzz (optional - fast text deduplication)")
+    except ImportError:
+        print("⚠ rapidfuzz not installed (optional - will use difflib)")
+    
     try:
         import torch
         print(f"✓ torch (optional - PyTorch {torch.__version__})")
@@ -97,6 +97,7 @@ from modules import (
     translate_batch_google,
     translate_batch_deepl,
     should_use_batch_translation,
+    clear_sentence_cache,
     DeepLContextManager,
     should_translate_text,
     is_valid_dialogue_text,
@@ -3133,6 +3134,7 @@ Chúc bạn sử dụng công cụ hiệu quả!
         # Reset text history and cache
         self.text_history = []
         self.translation_cache.clear()
+        clear_sentence_cache()
         self.pending_translation = None
         self.text_stability_counter = 0
         self.previous_text = ""
@@ -4839,7 +4841,9 @@ Chúc bạn sử dụng công cụ hiệu quả!
                         # Use batch translation
                         try:
                             # split_into_sentences returns batches (list of lists)
-                            batches = split_into_sentences(clean_text)
+                            # DeepL tự segment câu → bỏ qua bước tách câu, gửi nguyên text
+                            deepl_batch = bool(self.use_deepl and self.DEEPL_API_AVAILABLE and self.deepl_api_client)
+                            batches = split_into_sentences(clean_text, enable_split=not deepl_batch)
                             
                             if not batches:
                                 # No batches, fallback to single translation
@@ -4855,7 +4859,7 @@ Chúc bạn sử dụng công cụ hiệu quả!
                                 
                                 if not sentences:
                                     use_batch = False
-                                elif self.use_deepl and self.DEEPL_API_AVAILABLE and self.deepl_api_client:
+                                elif deepl_batch:
                                     # Map target language to DeepL format
                                     deepl_target_map = {
                                         'vi': 'VI',
@@ -4891,7 +4895,8 @@ Chúc bạn sử dụng công cụ hiệu quả!
                                 else:
                                     translated_sentences = translate_batch_google(
                                         self.translator,
-                                        sentences
+                                        sentences,
+                                        target_lang=self.target_language
                                     )
                                     # Convert list to string
                                     if translated_sentences: